@@ -1,12 +1,5 @@
-import vertexai
-from vertexai.generative_models import GenerativeModel
-import os
-
-# Set up authentication using service account key
-os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'service-account-key.json'
-
-# Initialize Vertex AI with project ID and location
-vertexai.init(project="ultimate-realm-473419-c7", location="us-central1") 
+# Vertex AI setup and the shared Gemini client live in multi_agents
+from multi_agents import get_model_provider
 
 def explain_in_plain_language(text_to_explain: str) -> str:
     """
@@ -14,8 +7,10 @@ def explain_in_plain_language(text_to_explain: str) -> str:
     This is the core of the Explanation Agent.
     """
     try:
-        # Using Gemini Pro, which is widely available.
-        model = GenerativeModel("gemini-pro") 
+        # Shared Gemini Pro client, created once per process on first use.
+        model = get_model_provider().get_model()
+        if model is None:
+            raise RuntimeError("Gemini model is not available (fallback mode)")
 
         # This prompt is crucial. It tells the AI how to behave.
         prompt = f"""
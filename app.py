@@ -1,5 +1,10 @@
-from flask import Flask, jsonify, request, render_template, redirect, url_for
-from multi_agents import AgentOrchestrator
+from flask import Flask, Response, jsonify, request, render_template, redirect, url_for, stream_with_context
+from multi_agents import (
+    AgentOrchestrator, PROMPT_STATS, ROUTING_STATS, STAGE_STATS, get_model_provider, verdict_needs_recheck
+)
+from job_store import JobStore, JobQueueFullError
+from session_store import SESSION_COOKIE, SessionStore
+import os
 import json
 
 # Initialize the Flask application
@@ -8,6 +13,21 @@ app = Flask(__name__)
 # Initialize the multi-agent system
 orchestrator = AgentOrchestrator()
 
+# Background jobs for /submit-issue?async=1; set JOB_STORE_PATH to keep job records in SQLite
+job_store = JobStore(
+    max_workers=int(os.environ.get('JOB_WORKERS', '4')),
+    max_pending=int(os.environ.get('JOB_MAX_PENDING', '100')),
+    ttl_seconds=float(os.environ.get('JOB_TTL_SECONDS', '3600')),
+    sqlite_path=os.environ.get('JOB_STORE_PATH') or None
+)
+
+# Latest analysis per browser session, reused by follow-up endpoints; SESSION_STORE_PATH enables SQLite
+session_store = SessionStore(
+    max_entries=int(os.environ.get('SESSION_MAX_ENTRIES', '10000')),
+    ttl_seconds=float(os.environ.get('SESSION_TTL_SECONDS', '1800')),
+    sqlite_path=os.environ.get('SESSION_STORE_PATH') or None
+)
+
 # --- Hardcoded Policy Rules ---
 # In a real application, this data would come from a database.
 # For now, we are keeping it simple.
@@ -107,6 +127,7 @@ POLICY_RULES = {
         },
         {
             "scheme_name": "Kamyab Jawan Program",
+            "min_age": 18,
             "age_limit": 35,
             "description": "Youth entrepreneurship and skill development.",
             "benefits": "Business loans up to PKR 5 million, skill training, mentorship",
@@ -140,10 +161,33 @@ def submit_issue():
                 "message": "Please describe your issue"
             }), 400
         
-        # Process through multi-agent system
-        result = orchestrator.solve_user_issue(user_issue, user_info)
+        if request.args.get("async", "").lower() in ("1", "true"):
+            try:
+                job_id = job_store.submit(
+                    lambda progress: orchestrator.solve_user_issue(user_issue, user_info, on_stage=progress)
+                )
+            except JobQueueFullError:
+                return jsonify({
+                    "status": "error",
+                    "message": "Too many requests are being processed, please try again shortly"
+                }), 503
+            return jsonify({
+                "status": "accepted",
+                "job_id": job_id,
+                "status_url": url_for("get_job", job_id=job_id)
+            }), 202
+        
+        session_id = current_session_id()
+        # A correction of the session's last submission only re-checks what the changed fields affect.
+        # The earlier analysis is always the server's own copy, never one sent by the client.
+        if data.get("correction"):
+            result = orchestrator.reevaluate(user_issue, user_info, session_store.get(session_id))
+        else:
+            # Process through multi-agent system
+            result = orchestrator.solve_user_issue(user_issue, user_info)
+        session_store.save_analysis(session_id, user_issue, user_info, result)
         
-        return jsonify(result)
+        return with_session_cookie(jsonify(result), session_id)
     
     except Exception as e:
         return jsonify({
@@ -152,6 +196,140 @@ def submit_issue():
         }), 500
 
 
+@app.route("/jobs/<job_id>", methods=['GET'])
+def get_job(job_id):
+    """Status, completed stages and partial or final result of an async submission."""
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({
+            "status": "error",
+            "message": "Job not found or expired"
+        }), 404
+    return jsonify(job)
+
+
+def current_session_id():
+    """Return the request's session id, see issued_session_id."""
+    return issued_session_id(request.cookies.get(SESSION_COOKIE))
+
+
+def issued_session_id(session_id):
+    """Return session_id if this server issued it and still holds it, else a new one.
+    
+    Ids chosen by the client are never adopted, so a session only ever
+    holds analyses the server computed for it.
+    """
+    if session_store.get(session_id) is None:
+        return session_store.new_session_id()
+    return session_id
+
+
+def with_session_cookie(response, session_id):
+    """Set (or refresh) the session cookie on a response."""
+    response.set_cookie(
+        SESSION_COOKIE, session_id, max_age=int(session_store.ttl_seconds), httponly=True, samesite="Lax"
+    )
+    return response
+
+
+def session_eligibility(session_id, scheme_name, user_info):
+    """Return the session's verdict for a scheme if it still holds for user_info, else None."""
+    session = session_store.get(session_id)
+    if session is None:
+        return None
+    verdict = session["eligibility"].get(scheme_name)
+    if verdict_needs_recheck(scheme_name, verdict, session["user_info"], user_info):
+        return None
+    return verdict
+
+
+def format_sse_event(event, data):
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route("/submit-issue/stream", methods=["POST"])
+def submit_issue_stream():
+    """Same as /submit-issue, but streams each agent's output as Server-Sent Events.
+    
+    Policy analysis and eligibility arrive as soon as each is ready; the
+    explanation, built without a model call right after eligibility, follows
+    line by line (see AgentOrchestrator.stream_user_issue).
+    """
+    data = request.get_json(silent=True) or {}
+    user_issue = data.get("issue", "")
+    user_info = data.get("user_info", {})
+    
+    if not user_issue.strip():
+        return jsonify({
+            "status": "error",
+            "message": "Please describe your issue"
+        }), 400
+    
+    session_id = current_session_id()
+    
+    def generate():
+        try:
+            analysis = {"status": "success"}
+            for event, payload in orchestrator.stream_user_issue(user_issue, user_info):
+                if event != "explanation":
+                    analysis.update(payload)
+                yield format_sse_event(event, payload)
+            session_store.save_analysis(session_id, user_issue, user_info, analysis)
+        except Exception as e:
+            yield format_sse_event("error", {
+                "status": "error",
+                "message": f"An error occurred: {str(e)}"
+            })
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        # Keep proxies (nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    return with_session_cookie(response, session_id)
+
+
+def parse_batch_line(line):
+    """Parse one JSONL batch record; None if the line is not valid JSON."""
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def format_batch_result(index, response):
+    """Format one NDJSON batch result line."""
+    return json.dumps({"index": index, "result": response}, ensure_ascii=False) + "\n"
+
+
+@app.route("/api/batch-submit", methods=["POST"])
+def batch_submit():
+    """Solve a JSONL body of {"issue", "user_info"} records, streaming NDJSON results as each finishes.
+    
+    Each result line carries the 0-based index of its record among the
+    non-blank input lines; results arrive in completion order.
+    """
+    def records():
+        for line in request.stream:
+            if line.strip():
+                yield parse_batch_line(line)
+    
+    def generate():
+        try:
+            for index, response in orchestrator.solve_many(records()):
+                yield format_batch_result(index, response)
+        except Exception as e:
+            yield json.dumps({"status": "error", "message": f"An error occurred: {str(e)}"}) + "\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.route("/api/eligibility-rules", methods=['GET'])
 def get_eligibility_rules():
     """This endpoint returns all the current policy rules."""
@@ -164,6 +342,28 @@ def get_schemes():
     return jsonify(POLICY_RULES)
 
 
+def metrics_snapshot():
+    """Model circuit breaker state, cache, memo, coalescing, routing, job and session counters, prompt sizes and stage timings."""
+    model_provider = get_model_provider()
+    return {
+        "circuit_breaker": model_provider.breaker_stats(),
+        "llm_cache": model_provider.cache_stats(),
+        "eligibility_memo": model_provider.memo_stats(),
+        "coalescing": orchestrator.coalescing_stats(),
+        "routing": ROUTING_STATS.snapshot(),
+        "jobs": job_store.stats(),
+        "sessions": session_store.stats(),
+        "prompt_tokens": PROMPT_STATS.snapshot(),
+        "stage_timings": STAGE_STATS.snapshot()
+    }
+
+
+@app.route("/api/metrics", methods=['GET'])
+def get_metrics():
+    """Serving metrics, see metrics_snapshot."""
+    return jsonify(metrics_snapshot())
+
+
 @app.route("/help")
 def help_page():
     """Help page with instructions."""
@@ -176,28 +376,29 @@ def about_page():
     return render_template("about.html")
 
 
+def find_scheme_details(scheme_name):
+    """Find a scheme in POLICY_RULES and return its details, or None."""
+    for category, schemes in POLICY_RULES.items():
+        for scheme in schemes:
+            if scheme.get("scheme_name") == scheme_name:
+                return {
+                    "name": scheme.get("scheme_name"),
+                    "description": scheme.get("description"),
+                    "benefits": scheme.get("benefits", ""),
+                    "application_process": scheme.get("application_process", ""),
+                    "helpline": scheme.get("helpline", ""),
+                    "website": scheme.get("website", ""),
+                    "required_documents": scheme.get("required_documents", []),
+                    "category": category.replace("_schemes", "").title()
+                }
+    return None
+
+
 @app.route("/api/scheme-details/<scheme_name>", methods=['GET'])
 def get_scheme_details(scheme_name):
     """Get detailed information about a specific scheme."""
     try:
-        # Find scheme in POLICY_RULES
-        scheme_details = None
-        for category, schemes in POLICY_RULES.items():
-            for scheme in schemes:
-                if scheme.get("scheme_name") == scheme_name:
-                    scheme_details = {
-                        "name": scheme.get("scheme_name"),
-                        "description": scheme.get("description"),
-                        "benefits": scheme.get("benefits", ""),
-                        "application_process": scheme.get("application_process", ""),
-                        "helpline": scheme.get("helpline", ""),
-                        "website": scheme.get("website", ""),
-                        "required_documents": scheme.get("required_documents", []),
-                        "category": category.replace("_schemes", "").title()
-                    }
-                    break
-            if scheme_details:
-                break
+        scheme_details = find_scheme_details(scheme_name)
         
         if scheme_details:
             return jsonify({
@@ -302,8 +503,11 @@ def assist_application():
                 "message": "Scheme name is required"
             }), 400
         
-        # Use ApplicationAssistantAgent
-        result = orchestrator.application_agent.assist_application(scheme_name, user_info, documents)
+        # Use ApplicationAssistantAgent, with the verdict /submit-issue already computed when it still holds
+        result = orchestrator.application_agent.assist_application(
+            scheme_name, user_info, documents,
+            eligibility_result=session_eligibility(request.cookies.get(SESSION_COOKIE), scheme_name, user_info)
+        )
         return jsonify(result)
         
     except Exception as e:
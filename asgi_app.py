@@ -0,0 +1,182 @@
+"""
+ASGI entry point for Citizen Bot Pakistan
+The routes that wait on the model, /submit-issue, /submit-issue/stream and
+/api/batch-submit, are served natively on the event loop: they await the
+async orchestrator (AgentOrchestrator.solve_user_issue_async,
+stream_user_issue_async and solve_many_async), so a request waiting on
+Vertex AI holds no thread. Every other route, and /submit-issue?async=1 job
+submissions, is the Flask app from app.py, mounted through a2wsgi's WSGI
+adapter.
+
+Run with any ASGI server, for example:
+    uvicorn asgi_app:app --port 5000
+"""
+
+import os
+import json
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import (
+    app as flask_app, format_batch_result, format_sse_event, issued_session_id, orchestrator, parse_batch_line,
+    session_store, with_session_cookie
+)
+from session_store import SESSION_COOKIE
+
+# Threads serving the Flask routes (pages, lookups, job polling); the native routes use none
+ASGI_WORKERS = int(os.environ.get('ASGI_WORKERS', '32'))
+
+
+def _input_terminated(wsgi_app):
+    """Let Flask read request bodies sent without Content-Length (chunked uploads to /api/batch-submit).
+
+    The adapter's wsgi.input ends where the ASGI body ends, which is what
+    wsgi.input_terminated promises.
+    """
+    def wrapped(environ, start_response):
+        environ["wsgi.input_terminated"] = True
+        return wsgi_app(environ, start_response)
+    return wrapped
+
+
+flask_routes = WSGIMiddleware(_input_terminated(flask_app), workers=ASGI_WORKERS)
+
+
+class FlaskResponse(Response):
+    """Hands a request a native route does not serve over to the Flask app; its body must be unread."""
+
+    def __init__(self):
+        pass
+
+    async def __call__(self, scope, receive, send):
+        await flask_routes(scope, receive, send)
+
+
+def error_response(message, status_code):
+    return JSONResponse({"status": "error", "message": message}, status_code=status_code)
+
+
+async def submit_issue(request):
+    """Async /submit-issue: the agents' model calls are awaited on the event loop."""
+    if request.query_params.get("async", "").lower() in ("1", "true"):
+        return FlaskResponse()
+    try:
+        data = await request.json()
+        user_issue = data.get("issue", "")
+        user_info = data.get("user_info", {})
+
+        if not user_issue.strip():
+            return error_response("Please describe your issue", 400)
+
+        session_id = issued_session_id(request.cookies.get(SESSION_COOKIE))
+        if data.get("correction"):
+            # Corrections re-check few schemes; reevaluate has no async variant, so keep it off the loop
+            result = await run_in_threadpool(
+                orchestrator.reevaluate, user_issue, user_info, session_store.get(session_id)
+            )
+        else:
+            result = await orchestrator.solve_user_issue_async(user_issue, user_info)
+        session_store.save_analysis(session_id, user_issue, user_info, result)
+
+        return with_session_cookie(JSONResponse(result), session_id)
+
+    except Exception as e:
+        return error_response(f"An error occurred: {str(e)}", 500)
+
+
+async def submit_issue_stream(request):
+    """Async /submit-issue/stream: Server-Sent Events from stream_user_issue_async."""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    user_issue = data.get("issue", "")
+    user_info = data.get("user_info", {})
+
+    if not user_issue.strip():
+        return error_response("Please describe your issue", 400)
+
+    session_id = issued_session_id(request.cookies.get(SESSION_COOKIE))
+
+    async def generate():
+        try:
+            analysis = {"status": "success"}
+            async for event, payload in orchestrator.stream_user_issue_async(user_issue, user_info):
+                if event != "explanation":
+                    analysis.update(payload)
+                yield format_sse_event(event, payload)
+            session_store.save_analysis(session_id, user_issue, user_info, analysis)
+        except Exception as e:
+            yield format_sse_event("error", {
+                "status": "error",
+                "message": f"An error occurred: {str(e)}"
+            })
+
+    response = StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        # Keep proxies (nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    return with_session_cookie(response, session_id)
+
+
+class BodyStreamingResponse(StreamingResponse):
+    """A StreamingResponse that may be sent while the request body is still being read.
+
+    StreamingResponse otherwise listens for the client disconnecting on
+    receive(), which would swallow the body messages; a write to a
+    disconnected client ends the response instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+
+
+async def body_lines(request):
+    """Yield the request body line by line as it arrives."""
+    pending = b""
+    async for chunk in request.stream():
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+async def batch_submit(request):
+    """Async /api/batch-submit: records are solved with solve_many_async as the body streams in."""
+    async def records():
+        async for line in body_lines(request):
+            if line.strip():
+                yield parse_batch_line(line)
+
+    async def generate():
+        try:
+            async for index, response in orchestrator.solve_many_async(records()):
+                yield format_batch_result(index, response)
+        except Exception as e:
+            yield json.dumps({"status": "error", "message": f"An error occurred: {str(e)}"}) + "\n"
+
+    return BodyStreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# Other methods on the native paths fall through to Flask, which answers OPTIONS and 405 as before
+app = Starlette(routes=[
+    Route("/submit-issue", submit_issue, methods=["POST"]),
+    Route("/submit-issue/stream", submit_issue_stream, methods=["POST"]),
+    Route("/api/batch-submit", batch_submit, methods=["POST"]),
+    Mount("/", flask_routes),
+])
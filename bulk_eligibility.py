@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Bulk eligibility scoring for Citizen Bot Pakistan
+Streams citizen records from a CSV or JSONL file through the agents in a
+process pool and writes NDJSON results incrementally, with resumable
+checkpoints. Always runs in fallback mode (no Vertex AI calls).
+
+Usage:
+    python bulk_eligibility.py district.csv -o results.ndjson
+    python bulk_eligibility.py district.jsonl -o results.ndjson --mode rules --resume
+"""
+
+import os
+import sys
+import csv
+import json
+import math
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, List, Any, Iterator, Optional
+
+from eligibility_rules import PROFILE_FIELDS
+
+# tqdm is optional, progress is simply not shown without it
+try:
+    from tqdm import tqdm
+    TQDM_AVAILABLE = True
+except ImportError:
+    TQDM_AVAILABLE = False
+    tqdm = None
+
+RECORD_KEYS = ("id", "issue", "user_info")
+
+_WORKER_ORCHESTRATOR = None
+
+
+def read_records(path: str, input_format: str = "auto") -> Iterator[Dict[str, Any]]:
+    """Yield {"id", "issue", "user_info"} records from a CSV or JSONL file, one at a time."""
+    if input_format == "auto":
+        input_format = "csv" if path.lower().endswith(".csv") else "jsonl"
+
+    with open(path, newline="", encoding="utf-8") as handle:
+        if input_format == "csv":
+            rows = csv.DictReader(handle)
+        else:
+            rows = (json.loads(line) for line in handle if line.strip())
+
+        for index, row in enumerate(rows):
+            if input_format == "csv":
+                row = _parse_csv_row(row)
+            yield _normalize_record(row, index)
+
+
+def _parse_csv_row(row: Dict[str, str]) -> Dict[str, Any]:
+    """Turn CSV cells (all strings) into the values a JSON record would carry.
+    
+    Profile fields become numbers, 0 when blank or not a number (i.e. not
+    provided); other blank cells are left out.
+    """
+    parsed = {}
+    for key, value in row.items():
+        value = (value or "").strip()
+        if key in PROFILE_FIELDS:
+            parsed[key] = _parse_number(value)
+        elif value:
+            parsed[key] = value
+    return parsed
+
+
+def _parse_number(value: str) -> float:
+    try:
+        number = float(value.replace(",", ""))
+    except ValueError:
+        return 0
+    if not math.isfinite(number) or number <= 0:
+        return 0
+    return int(number) if number.is_integer() else number
+
+
+def _normalize_record(row: Dict[str, Any], index: int) -> Dict[str, Any]:
+    """Accept nested ({"user_info": {...}}) or flat rows and return one record shape."""
+    user_info = row.get("user_info")
+    if not isinstance(user_info, dict):
+        user_info = {key: value for key, value in row.items() if key not in RECORD_KEYS}
+    return {
+        "id": row.get("id") or index,
+        "issue": row.get("issue") or "",
+        "user_info": user_info
+    }
+
+
+def _init_worker(mode: str) -> None:
+    """Put the worker process in fallback mode and build its orchestrator."""
+    global _WORKER_ORCHESTRATOR
+    # Bulk runs never call the model; set before multi_agents is first imported in this process
+    os.environ['FALLBACK_MODE'] = 'true'
+    import multi_agents
+    # A forked worker may have inherited an already-imported multi_agents
+    multi_agents.FALLBACK_MODE = True
+    if mode == "orchestrator":
+        _WORKER_ORCHESTRATOR = multi_agents.AgentOrchestrator()
+
+
+def _process_chunk(mode: str, records: List[Dict[str, Any]]) -> List[str]:
+    """Score a chunk of records and return their NDJSON lines in input order."""
+    if mode == "rules":
+        return _score_rules(records)
+
+    lines = []
+    for record in records:
+        try:
+            result = _WORKER_ORCHESTRATOR.solve_user_issue(record["issue"], record["user_info"])
+        except Exception as e:
+            result = {"status": "error", "message": str(e)}
+        lines.append(json.dumps({"id": record["id"], "result": result}, ensure_ascii=False))
+    return lines
+
+
+def _score_rules(records: List[Dict[str, Any]]) -> List[str]:
+    """Check every scheme for a chunk of records with the vectorized rule engine."""
+    from multi_agents import get_scheme_registry
+    from eligibility_rules import REASON_NAMES, profile_columns
+
+    thresholds = get_scheme_registry().thresholds()
+    eligible, reason_codes = thresholds.evaluate(profile_columns([record["user_info"] for record in records]))
+
+    lines = []
+    for row, record in enumerate(records):
+        lines.append(json.dumps({
+            "id": record["id"],
+            "eligible_schemes": [name for column, name in enumerate(thresholds.scheme_names) if eligible[row, column]],
+            "reasons": {name: REASON_NAMES[int(reason_codes[row, column])]
+                        for column, name in enumerate(thresholds.scheme_names)}
+        }, ensure_ascii=False))
+    return lines
+
+
+def _chunks(records: Iterator[Dict[str, Any]], chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Group a record stream into lists of at most chunk_size records."""
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    """Return the saved checkpoint, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def save_checkpoint(path: str, records_done: int, output_offset: int) -> None:
+    """Atomically record how many records (and output bytes) are safely written."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as handle:
+        json.dump({"records_done": records_done, "output_offset": output_offset}, handle)
+    os.replace(temp_path, path)
+
+
+def run_bulk(input_path: str, output_path: str, mode: str = "orchestrator", workers: int = None,
+             chunk_size: int = 500, input_format: str = "auto", checkpoint_path: str = None,
+             resume: bool = False, show_progress: bool = True) -> int:
+    """Score every record of input_path into output_path; returns the number of records written.
+
+    At most ``2 * workers`` chunks are in flight, so memory stays bounded by
+    the chunk size regardless of the input size. Chunks are written in input
+    order and the checkpoint is updated after each one; with ``resume`` the
+    output is truncated back to the last checkpoint and the already-scored
+    records are skipped. Raises ValueError if the output is missing or
+    shorter than the checkpoint says, since those records cannot be kept.
+    """
+    workers = workers or os.cpu_count() or 1
+    checkpoint_path = checkpoint_path or f"{output_path}.checkpoint"
+
+    records_done = 0
+    output_offset = 0
+    checkpoint = load_checkpoint(checkpoint_path) if resume else None
+    if checkpoint:
+        records_done = checkpoint["records_done"]
+        output_offset = checkpoint["output_offset"]
+        output_size = os.path.getsize(output_path) if os.path.exists(output_path) else None
+        if output_size is None or output_size < output_offset:
+            found = "is missing" if output_size is None else f"has {output_size:,} bytes"
+            raise ValueError(
+                f"Cannot resume: {output_path} {found} but the checkpoint expects {output_offset:,}; "
+                "run again without --resume"
+            )
+
+    records = read_records(input_path, input_format)
+    # Consume skipped records without holding them
+    for _ in islice(records, records_done):
+        pass
+
+    progress = None
+    if show_progress and TQDM_AVAILABLE:
+        progress = tqdm(initial=records_done, unit="records", desc="Scoring")
+
+    mode_flag = "r+b" if checkpoint else "wb"
+    with open(output_path, mode_flag) as output, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(mode,)) as pool:
+        output.truncate(output_offset)
+        output.seek(output_offset)
+
+        pending = deque()
+        chunks = _chunks(records, chunk_size)
+
+        def _drain_one() -> None:
+            nonlocal records_done, output_offset
+            size, future = pending.popleft()
+            lines = future.result()
+            output.write(("\n".join(lines) + "\n").encode("utf-8"))
+            output.flush()
+            os.fsync(output.fileno())
+            records_done += size
+            output_offset = output.tell()
+            save_checkpoint(checkpoint_path, records_done, output_offset)
+            if progress is not None:
+                progress.update(size)
+
+        for chunk in chunks:
+            pending.append((len(chunk), pool.submit(_process_chunk, mode, chunk)))
+            if len(pending) >= workers * 2:
+                _drain_one()
+        while pending:
+            _drain_one()
+
+    if progress is not None:
+        progress.close()
+
+    return records_done
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Score citizen records for scheme eligibility in bulk.")
+    parser.add_argument("input", help="CSV or JSONL file of citizen records")
+    parser.add_argument("-o", "--output", required=True, help="NDJSON file to write results to")
+    parser.add_argument("--mode", choices=["orchestrator", "rules"], default="orchestrator",
+                        help="full agent pipeline in fallback mode, or vectorized rule checks only")
+    parser.add_argument("--format", dest="input_format", choices=["auto", "csv", "jsonl"], default="auto")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="records per work unit")
+    parser.add_argument("--checkpoint", default=None, help="checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--resume", action="store_true", help="continue from the last checkpoint")
+    parser.add_argument("--no-progress", action="store_true", help="do not show a progress bar")
+    args = parser.parse_args(argv)
+
+    try:
+        written = run_bulk(
+            args.input, args.output, mode=args.mode, workers=args.workers, chunk_size=args.chunk_size,
+            input_format=args.input_format, checkpoint_path=args.checkpoint, resume=args.resume,
+            show_progress=not args.no_progress
+        )
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ Scored {written:,} records into {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
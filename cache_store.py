@@ -0,0 +1,168 @@
+"""
+Persistent LRU cache for Citizen Bot Pakistan
+An in-memory LRU with a size cap and optional TTL, optionally backed by a
+SQLite file so entries survive restarts and are shared between worker
+processes. Values must be JSON-serializable.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+# Expired and surplus SQLite rows are pruned once every this many writes
+PRUNE_EVERY_WRITES = 100
+
+
+class PersistentLRUCache:
+    """Thread-safe LRU cache with TTL expiry and optional SQLite backing.
+
+    The SQLite table is kept to about ``max_entries`` rows as well: every
+    PRUNE_EVERY_WRITES writes, expired rows are deleted and then the least
+    recently written rows beyond the cap.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None,
+                 sqlite_path: Optional[str] = None, table: str = "cache"):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path
+        self.table = table
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._db = None
+        self._db_pid = None
+        self._writes = 0
+
+    def get(self, key: str, fresh: bool = False) -> Any:
+        """Return the cached value for key, or None if absent or expired.
+
+        With ``fresh``, a SQLite-backed cache reads the disk copy first, so
+        values rewritten by other processes are seen.
+        """
+        now = time.time()
+        with self._lock:
+            entry = None if fresh and self.sqlite_path else self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+
+            db = self._connection()
+            if db is not None:
+                row = db.execute(
+                    f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and (row[1] is None or row[1] > now):
+                    value = json.loads(row[0])
+                    self._store(key, row[1], value)
+                    self._hits += 1
+                    return value
+
+            self._misses += 1
+            return None
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Store value under key; ttl_seconds overrides the cache default."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._store(key, expires_at, value)
+            db = self._connection()
+            if db is not None:
+                db.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), expires_at)
+                )
+                self._writes += 1
+                if self._writes % PRUNE_EVERY_WRITES == 0:
+                    self._prune(db, time.time())
+                db.commit()
+
+    def delete(self, key: str) -> None:
+        """Remove key from memory and disk."""
+        with self._lock:
+            self._entries.pop(key, None)
+            db = self._connection()
+            if db is not None:
+                db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                db.commit()
+
+    def clear(self) -> None:
+        """Remove every entry from memory and disk."""
+        with self._lock:
+            self._entries.clear()
+            db = self._connection()
+            if db is not None:
+                db.execute(f"DELETE FROM {self.table}")
+                db.commit()
+
+    def purge_expired(self) -> int:
+        """Drop expired entries from memory and disk; returns how many were in memory."""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._entries.items()
+                       if expires_at is not None and expires_at <= now]
+            for key in expired:
+                del self._entries[key]
+            db = self._connection()
+            if db is not None:
+                self._prune(db, now)
+                db.commit()
+            return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current in-memory size."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "persistent": bool(self.sqlite_path)
+            }
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        # Opened lazily and per process, so forked workers never share a handle
+        if not self.sqlite_path:
+            return None
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.sqlite_path, timeout=5, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            self._db.commit()
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _prune(self, db: sqlite3.Connection, now: float) -> None:
+        # Caller holds the lock and commits. INSERT OR REPLACE gives a rewritten
+        # key a new rowid, so the lowest rowids are the least recently written.
+        db.execute(f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        db.execute(
+            f"DELETE FROM {self.table} WHERE rowid IN "
+            f"(SELECT rowid FROM {self.table} ORDER BY rowid LIMIT max(0, (SELECT COUNT(*) FROM {self.table}) - ?))",
+            (self.max_entries,)
+        )
+
+    def _store(self, key: str, expires_at: Optional[float], value: Any) -> None:
+        # Caller holds the lock
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
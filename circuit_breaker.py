@@ -0,0 +1,150 @@
+"""
+Circuit Breaker for Citizen Bot Pakistan
+Stops calling Vertex AI while it is failing, so agents go straight to their
+rule-based fallbacks instead of paying connect/timeout costs on every call.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Awaitable, Callable
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the model while the breaker is open."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by the failure rate over a sliding window.
+
+    - closed: calls go through; once at least ``minimum_calls`` of the last
+      ``window_size`` calls are recorded and the failure rate reaches
+      ``failure_rate_threshold``, the breaker opens.
+    - open: calls are rejected for ``open_seconds``, then the breaker turns
+      half-open.
+    - half-open: up to ``half_open_probes`` probe calls are let through; a
+      successful probe closes the breaker, a failed one opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str = "vertex", failure_rate_threshold: float = 0.5, window_size: int = 20,
+                 minimum_calls: int = 5, open_seconds: float = 30.0, half_open_probes: int = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._window = deque(maxlen=window_size)  # True = failure
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._counters = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        """Current state, turning open into half-open once the open period is over."""
+        with self._lock:
+            return self._current_state()
+
+    def is_rejecting(self) -> bool:
+        """True while calls would be rejected outright (open, or half-open with all probes out)."""
+        with self._lock:
+            state = self._current_state()
+            return state == self.OPEN or (
+                state == self.HALF_OPEN and self._probes_in_flight >= self.half_open_probes
+            )
+
+    def allow_request(self) -> bool:
+        """Reserve permission for one call; every allowed call must be followed by a record_*."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+            self._counters["rejected"] += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._counters["successes"] += 1
+            if self._state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._state = self.CLOSED
+                self._window.clear()
+            else:
+                self._window.append(False)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._counters["failures"] += 1
+            if self._state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._open()
+                return
+            self._window.append(True)
+            if len(self._window) >= self.minimum_calls and self._failure_rate() >= self.failure_rate_threshold:
+                self._open()
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run func through the breaker, raising CircuitOpenError when it is open."""
+        if not self.allow_request():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open; skipping call")
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    async def call_async(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Await func through the breaker, raising CircuitOpenError when it is open."""
+        if not self.allow_request():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open; skipping call")
+        try:
+            result = await func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the state and counters for the metrics endpoint."""
+        with self._lock:
+            state = self._current_state()
+            retry_in = 0.0
+            if state == self.OPEN:
+                retry_in = max(0.0, self._opened_at + self.open_seconds - self._clock())
+            return {
+                "name": self.name,
+                "state": state,
+                "failure_rate": round(self._failure_rate(), 4),
+                "window_calls": len(self._window),
+                "retry_in_seconds": round(retry_in, 2),
+                **self._counters
+            }
+
+    def _current_state(self) -> str:
+        # Caller holds the lock
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probes_in_flight = 0
+        return self._state
+
+    def _failure_rate(self) -> float:
+        return sum(self._window) / len(self._window) if self._window else 0.0
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self._window.clear()
+        self._counters["opened"] += 1
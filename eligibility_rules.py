@@ -0,0 +1,328 @@
+"""
+Eligibility Rule Engine for Citizen Bot Pakistan
+Compiles the criteria fields of each scheme in the policy catalogue into
+predicates once, then evaluates citizen profiles against them, either one
+profile at a time or as columnar NumPy batches.
+"""
+
+import math
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+# NumPy is only needed for batch evaluation
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+# Profile fields the rules can read, in the order predicates are evaluated
+PROFILE_FIELDS = ("monthly_income", "number_of_children", "family_size", "age")
+
+# Scheme criteria keys -> (profile field, bound)
+CRITERIA_FIELDS = {
+    "min_monthly_income": ("monthly_income", "min"),
+    "max_monthly_income": ("monthly_income", "max"),
+    "income_limit": ("monthly_income", "max"),
+    "min_children": ("number_of_children", "min"),
+    "min_family_size": ("family_size", "min"),
+    "min_age": ("age", "min"),
+    "age_limit": ("age", "max"),
+}
+
+# Reason codes, ordered by how a verdict is decided: a failed bound wins over missing data
+REASON_ELIGIBLE = 0
+REASON_MISSING_INFORMATION = 1
+REASON_BELOW_MINIMUM = 2
+REASON_ABOVE_MAXIMUM = 3
+
+REASON_NAMES = {
+    REASON_ELIGIBLE: "eligible",
+    REASON_MISSING_INFORMATION: "missing_information",
+    REASON_BELOW_MINIMUM: "below_minimum",
+    REASON_ABOVE_MAXIMUM: "above_maximum",
+}
+
+
+def _format_number(value: float) -> str:
+    """Format a number with thousands separators, dropping a zero fraction."""
+    if float(value).is_integer():
+        return f"{int(value):,}"
+    return f"{value:,.2f}"
+
+
+# Profile field -> (label, noun, value formatter)
+FIELD_LABELS = {
+    "monthly_income": ("Income", "income", lambda v: f"PKR {_format_number(v)}"),
+    "number_of_children": ("Number of children", "children", _format_number),
+    "family_size": ("Family size", "family size", _format_number),
+    "age": ("Age", "age", lambda v: f"{_format_number(v)} years"),
+}
+
+
+def profile_value(user_info: Dict[str, Any], field: str) -> float:
+    """Read a numeric profile field; 0 means the citizen did not provide it."""
+    value = user_info.get(field, 0)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    if not math.isfinite(value) or value <= 0:
+        return 0.0
+    return value
+
+
+def changed_profile_fields(before: Dict[str, Any], after: Dict[str, Any]) -> frozenset:
+    """Return the profile fields whose value, as the rules read it, differs between two profiles."""
+    return frozenset(
+        field for field in PROFILE_FIELDS
+        if profile_value(before, field) != profile_value(after, field)
+    )
+
+
+def conflicting_profile_fields(user_info: Dict[str, Any]) -> frozenset:
+    """Return the profile fields whose values contradict each other (empty if the profile is consistent)."""
+    children = profile_value(user_info, "number_of_children")
+    family_size = profile_value(user_info, "family_size")
+    # A family counts at least one parent besides the children
+    if children and family_size and children >= family_size:
+        return frozenset(("number_of_children", "family_size"))
+    return frozenset()
+
+
+class ThresholdPredicate:
+    """Inclusive minimum/maximum bound on one profile field."""
+
+    __slots__ = ("field", "minimum", "maximum")
+
+    def __init__(self, field: str, minimum: Optional[float] = None, maximum: Optional[float] = None):
+        self.field = field
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def evaluate(self, value: float) -> Tuple[int, str, Optional[str]]:
+        """Return (reason code, reason text, missing requirement) for a profile value."""
+        label, noun, fmt = FIELD_LABELS[self.field]
+
+        if value <= 0:
+            return REASON_MISSING_INFORMATION, "", f"{label} information required"
+
+        if self.minimum is not None and value < self.minimum:
+            return (
+                REASON_BELOW_MINIMUM,
+                f"{label} is below the minimum for this scheme",
+                f"{label} too low (your {noun}: {fmt(value)}, minimum required: {fmt(self.minimum)})"
+            )
+
+        if self.maximum is not None and value > self.maximum:
+            return (
+                REASON_ABOVE_MAXIMUM,
+                f"{label} is above the limit for this scheme",
+                f"{label} exceeds limit (your {noun}: {fmt(value)}, max allowed: {fmt(self.maximum)})"
+            )
+
+        if self.minimum is not None and self.maximum is not None:
+            reason = f"✅ {label} is within range ({fmt(value)} is between {fmt(self.minimum)} - {fmt(self.maximum)})"
+        elif self.maximum is not None:
+            reason = f"✅ {label} is within limit ({fmt(value)} ≤ {fmt(self.maximum)})"
+        elif self.minimum is not None:
+            reason = f"✅ {label} requirement met ({fmt(value)} ≥ {fmt(self.minimum)} required)"
+        else:
+            reason = f"✅ {label} provided ({fmt(value)})"
+        return REASON_ELIGIBLE, reason, None
+
+
+class EligibilityVerdict:
+    """Outcome of evaluating one scheme's rules against a profile."""
+
+    __slots__ = ("scheme_name", "eligible", "reason_code", "reasons", "missing_requirements")
+
+    def __init__(self, scheme_name: str, eligible: bool, reason_code: int,
+                 reasons: List[str], missing_requirements: List[str]):
+        self.scheme_name = scheme_name
+        self.eligible = eligible
+        self.reason_code = reason_code
+        self.reasons = reasons
+        self.missing_requirements = missing_requirements
+
+
+class SchemeRules:
+    """Compiled eligibility rules for a single scheme."""
+
+    __slots__ = ("scheme_name", "predicates", "fields")
+
+    def __init__(self, scheme_name: str, predicates: List[ThresholdPredicate]):
+        self.scheme_name = scheme_name
+        self.predicates = tuple(predicates)
+        self.fields = frozenset(predicate.field for predicate in self.predicates)
+
+    def project(self, user_info: Dict[str, Any]) -> Dict[str, float]:
+        """Return the profile values these rules read; equal projections get equal verdicts."""
+        return {predicate.field: profile_value(user_info, predicate.field) for predicate in self.predicates}
+
+    def evaluate(self, user_info: Dict[str, Any]) -> EligibilityVerdict:
+        """Evaluate every predicate and combine them into a verdict."""
+        reason_code = REASON_ELIGIBLE
+        reasons = []
+        missing_requirements = []
+        missing_fields = []
+
+        for predicate in self.predicates:
+            code, reason, missing = predicate.evaluate(profile_value(user_info, predicate.field))
+            if code == REASON_MISSING_INFORMATION:
+                missing_fields.append(FIELD_LABELS[predicate.field][1])
+            elif reason:
+                reasons.append(reason)
+            if missing:
+                missing_requirements.append(missing)
+            # The first failed bound decides the verdict; missing data only if nothing failed
+            if code > REASON_MISSING_INFORMATION and reason_code <= REASON_MISSING_INFORMATION:
+                reason_code = code
+            elif code == REASON_MISSING_INFORMATION and reason_code == REASON_ELIGIBLE:
+                reason_code = code
+
+        eligible = reason_code == REASON_ELIGIBLE
+        if eligible:
+            reasons.append(f"🎉 You are eligible for {self.scheme_name}!")
+        elif reason_code == REASON_MISSING_INFORMATION:
+            reasons.append(f"ℹ️ Please provide {' and '.join(missing_fields)} information for accurate assessment")
+
+        return EligibilityVerdict(self.scheme_name, eligible, reason_code, reasons, missing_requirements)
+
+
+def compile_scheme_rules(scheme: Dict[str, Any]) -> SchemeRules:
+    """Compile the criteria fields of one scheme into predicates."""
+    bounds = {}
+    for key, (field, bound) in CRITERIA_FIELDS.items():
+        if key in scheme and scheme[key] is not None:
+            minimum, maximum = bounds.get(field, (None, None))
+            if bound == "min":
+                minimum = float(scheme[key])
+            else:
+                maximum = float(scheme[key])
+            bounds[field] = (minimum, maximum)
+
+    # Schemes without criteria still need an income figure before we suggest them
+    if not bounds:
+        bounds["monthly_income"] = (None, None)
+
+    predicates = [
+        ThresholdPredicate(field, *bounds[field])
+        for field in PROFILE_FIELDS if field in bounds
+    ]
+    return SchemeRules(scheme["name"], predicates)
+
+
+def compile_rules(policies: Dict[str, List[Dict[str, Any]]]) -> Dict[str, SchemeRules]:
+    """Compile rules for every scheme in a policy catalogue, keyed by scheme name."""
+    return {
+        scheme["name"]: compile_scheme_rules(scheme)
+        for schemes in policies.values()
+        for scheme in schemes
+    }
+
+
+class SchemeThresholds:
+    """Compiled rules of several schemes laid out as per-field NumPy bound arrays."""
+
+    def __init__(self, rules: Sequence[SchemeRules]):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy is required for batch eligibility evaluation")
+
+        self.scheme_names = tuple(rule.scheme_name for rule in rules)
+        count = len(rules)
+        # field -> (reads[M], minimum[M], maximum[M]); unbounded sides are +/-inf
+        self.bounds = {}
+        for field in PROFILE_FIELDS:
+            reads = np.zeros(count, dtype=bool)
+            minimum = np.full(count, -np.inf)
+            maximum = np.full(count, np.inf)
+            for index, rule in enumerate(rules):
+                for predicate in rule.predicates:
+                    if predicate.field != field:
+                        continue
+                    reads[index] = True
+                    if predicate.minimum is not None:
+                        minimum[index] = predicate.minimum
+                    if predicate.maximum is not None:
+                        maximum[index] = predicate.maximum
+            if reads.any():
+                self.bounds[field] = (reads, minimum, maximum)
+
+    def evaluate(self, columns: Dict[str, Any]) -> Tuple[Any, Any]:
+        """Evaluate N profiles against M schemes.
+
+        ``columns`` maps profile fields to equal-length array-likes; absent
+        columns, zeros, negatives and NaN count as "not provided", exactly as
+        in SchemeRules.evaluate. Returns an (N, M) boolean eligibility matrix
+        and an (N, M) int8 matrix of REASON_* codes.
+        """
+        size = _column_length(columns)
+        codes = np.zeros((size, len(self.scheme_names)), dtype=np.int8)
+
+        for field in PROFILE_FIELDS:
+            if field not in self.bounds:
+                continue
+            reads, minimum, maximum = self.bounds[field]
+            values = _column_values(columns, field, size)
+            provided = (values > 0)[:, None]
+            undecided = codes <= REASON_MISSING_INFORMATION
+
+            # The first failed bound decides, matching predicate order in SchemeRules
+            codes[undecided & provided & (values[:, None] < minimum)] = REASON_BELOW_MINIMUM
+            codes[undecided & provided & (values[:, None] > maximum)] = REASON_ABOVE_MAXIMUM
+            codes[(codes == REASON_ELIGIBLE) & ~provided & reads] = REASON_MISSING_INFORMATION
+
+        return codes == REASON_ELIGIBLE, codes
+
+
+def _column_length(columns: Dict[str, Any]) -> int:
+    """Return the shared length of the profile columns."""
+    lengths = {len(columns[field]) for field in PROFILE_FIELDS if field in columns}
+    if len(lengths) > 1:
+        raise ValueError(f"Profile columns have different lengths: {sorted(lengths)}")
+    return lengths.pop() if lengths else 0
+
+
+def _column_values(columns: Dict[str, Any], field: str, size: int) -> Any:
+    """Return a float64 column with NaN mapped to 0 ("not provided")."""
+    if field not in columns:
+        return np.zeros(size)
+    values = np.asarray(columns[field], dtype=np.float64)
+    return np.nan_to_num(values, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def profile_columns(user_infos: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Convert a list of user_info dicts into the columnar layout used for batches."""
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("NumPy is required for batch eligibility evaluation")
+    return {
+        field: np.fromiter((profile_value(user_info, field) for user_info in user_infos),
+                           dtype=np.float64, count=len(user_infos))
+        for field in PROFILE_FIELDS
+    }
+
+
+if __name__ == "__main__":
+    # Throughput benchmark against the live catalogue
+    import time
+    from multi_agents import get_scheme_registry
+
+    registry = get_scheme_registry()
+    thresholds = registry.thresholds()
+    records = 1_000_000
+    rng = np.random.default_rng(0)
+    columns = {
+        "monthly_income": rng.integers(0, 80000, records).astype(np.float64),
+        "number_of_children": rng.integers(0, 6, records).astype(np.float64),
+        "family_size": rng.integers(0, 10, records).astype(np.float64),
+        "age": rng.integers(0, 70, records).astype(np.float64),
+    }
+
+    start = time.perf_counter()
+    eligible, codes = thresholds.evaluate(columns)
+    elapsed = time.perf_counter() - start
+
+    print(f"Evaluated {records:,} records x {len(thresholds.scheme_names)} schemes "
+          f"in {elapsed:.3f}s ({records / elapsed:,.0f} records/sec)")
+    print(f"Eligible (record, scheme) pairs: {int(eligible.sum()):,}")
@@ -0,0 +1,285 @@
+"""
+Fake Gemini backend for Citizen Bot Pakistan
+A local stand-in for vertexai's GenerativeModel with the same generate_content
+surface, for load tests and offline benchmarks. It answers policy and
+eligibility prompts with plausible JSON and anything else with text, and can
+inject latency, errors, malformed JSON and streaming.
+
+Selected with LLM_BACKEND=fake and configured through FAKE_LLM_* variables:
+    FAKE_LLM_LATENCY_MS            mean latency of a call (default 800)
+    FAKE_LLM_LATENCY_DISTRIBUTION  fixed, uniform, exponential or lognormal (default lognormal)
+    FAKE_LLM_LATENCY_SPREAD        uniform: +/- fraction of the mean; lognormal: sigma (default 0.5)
+    FAKE_LLM_ERROR_RATE            fraction of calls that raise (default 0)
+    FAKE_LLM_MALFORMED_RATE        fraction of JSON answers that are cut short (default 0)
+    FAKE_LLM_STREAM_CHUNK_CHARS    characters per streamed chunk (default 40)
+    FAKE_LLM_STREAM_CHUNK_MS       delay between streamed chunks (default 20)
+    FAKE_LLM_SEED                  seed for reproducible runs
+
+Benchmark the agent pipeline against it:
+    LLM_BACKEND=fake python fake_model.py --requests 200 --concurrency 16
+"""
+
+import os
+import re
+import json
+import math
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, List, Any, AsyncIterator, Iterator, Optional, Tuple
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+# Words that point the fake policy analysis at a catalogue category
+CATEGORY_KEYWORDS = {
+    "education": ["school", "education", "fees", "student", "university", "college", "books", "taleem"],
+    "housing": ["house", "housing", "home", "rent", "ghar", "shelter", "property"],
+    "healthcare": ["health", "hospital", "doctor", "medical", "medicine", "treatment", "ilaj"],
+    "employment": ["job", "work", "employment", "business", "loan", "unemployed", "naukri", "cash"],
+}
+
+
+class FakeModelError(RuntimeError):
+    """Injected failure, standing in for a Vertex AI service error."""
+
+
+class FakeResponse:
+    """Minimal stand-in for a GenerationResponse."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Drop-in replacement for GenerativeModel that never leaves the process."""
+
+    def __init__(self, model_name: str = "gemini-pro", latency_ms: float = 800.0,
+                 latency_distribution: str = "lognormal", latency_spread: float = 0.5,
+                 error_rate: float = 0.0, malformed_rate: float = 0.0,
+                 stream_chunk_chars: int = 40, stream_chunk_ms: float = 20.0, seed: Optional[int] = None):
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.latency_spread = latency_spread
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.stream_chunk_chars = max(1, stream_chunk_chars)
+        self.stream_chunk_ms = stream_chunk_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, model_name: str = "gemini-pro") -> "FakeGenerativeModel":
+        """Build a fake model configured from the FAKE_LLM_* environment variables."""
+        seed = os.environ.get('FAKE_LLM_SEED')
+        return cls(
+            model_name=model_name,
+            latency_ms=float(os.environ.get('FAKE_LLM_LATENCY_MS', '800')),
+            latency_distribution=os.environ.get('FAKE_LLM_LATENCY_DISTRIBUTION', 'lognormal').lower(),
+            latency_spread=float(os.environ.get('FAKE_LLM_LATENCY_SPREAD', '0.5')),
+            error_rate=float(os.environ.get('FAKE_LLM_ERROR_RATE', '0')),
+            malformed_rate=float(os.environ.get('FAKE_LLM_MALFORMED_RATE', '0')),
+            stream_chunk_chars=int(os.environ.get('FAKE_LLM_STREAM_CHUNK_CHARS', '40')),
+            stream_chunk_ms=float(os.environ.get('FAKE_LLM_STREAM_CHUNK_MS', '20')),
+            seed=int(seed) if seed else None
+        )
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        """Answer a prompt after the injected latency; with stream=True, return an iterator of chunks."""
+        latency, fail, malformed = self._draw()
+        # Time to first token; failures also cost a round trip
+        time.sleep(latency)
+        text = self._answer(prompt, fail, malformed)
+        return self._stream(text) if stream else FakeResponse(text)
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+        """Async counterpart of generate_content; with stream=True, return an async iterator of chunks."""
+        latency, fail, malformed = self._draw()
+        await asyncio.sleep(latency)
+        text = self._answer(prompt, fail, malformed)
+        return self._stream_async(text) if stream else FakeResponse(text)
+
+    def respond(self, prompt: str) -> str:
+        """Return the answer text for a prompt, without latency or fault injection."""
+        if "Schemes: [" in prompt and "User Information:" in prompt:
+            return json.dumps(self._eligibility_many(prompt), indent=2)
+        if "Scheme:" in prompt and "User Information:" in prompt:
+            return json.dumps(self._eligibility(prompt), indent=2)
+        if "Citizen's issue:" in prompt:
+            return json.dumps(self._policy_analysis(prompt), indent=2)
+        return self._text(prompt)
+
+    def _draw(self) -> Tuple[float, bool, bool]:
+        """Pick (latency seconds, fail, malformed) for one call."""
+        with self._lock:
+            return (
+                self._sample_latency(),
+                self._random.random() < self.error_rate,
+                self._random.random() < self.malformed_rate
+            )
+
+    def _answer(self, prompt, fail: bool, malformed: bool) -> str:
+        if fail:
+            raise FakeModelError("503 Service Unavailable (injected by fake model)")
+        prompt = prompt if isinstance(prompt, str) else " ".join(str(part) for part in prompt)
+        text = self.respond(prompt)
+        if malformed and text.lstrip().startswith(("{", "[")):
+            text = text[:max(1, len(text) // 2)]
+        return text
+
+    def _stream(self, text: str) -> Iterator[FakeResponse]:
+        for start in range(0, len(text), self.stream_chunk_chars):
+            if start:
+                time.sleep(self.stream_chunk_ms / 1000.0)
+            yield FakeResponse(text[start:start + self.stream_chunk_chars])
+
+    async def _stream_async(self, text: str) -> AsyncIterator[FakeResponse]:
+        for start in range(0, len(text), self.stream_chunk_chars):
+            if start:
+                await asyncio.sleep(self.stream_chunk_ms / 1000.0)
+            yield FakeResponse(text[start:start + self.stream_chunk_chars])
+
+    def _sample_latency(self) -> float:
+        # Caller holds the lock; returns seconds
+        mean = self.latency_ms / 1000.0
+        if mean <= 0:
+            return 0.0
+        if self.latency_distribution == "fixed":
+            return mean
+        if self.latency_distribution == "uniform":
+            return max(0.0, self._random.uniform(mean * (1 - self.latency_spread), mean * (1 + self.latency_spread)))
+        if self.latency_distribution == "exponential":
+            return self._random.expovariate(1.0 / mean)
+        # Lognormal with the requested mean: a long tail like real model latencies
+        sigma = self.latency_spread
+        return self._random.lognormvariate(math.log(mean) - sigma * sigma / 2, sigma)
+
+    def _policy_analysis(self, prompt: str) -> Dict[str, Any]:
+        from multi_agents import get_scheme_registry
+
+        match = re.search(r'Citizen\'s issue: "(.*?)"\s*\n', prompt, re.DOTALL)
+        issue = (match.group(1) if match else prompt).lower()
+        scores = {
+            category: sum(1 for keyword in keywords if keyword in issue)
+            for category, keywords in CATEGORY_KEYWORDS.items()
+        }
+        best = max(scores, key=scores.get)
+        issue_type = best if scores[best] > 0 else "general"
+
+        registry = get_scheme_registry()
+        if issue_type == "general":
+            schemes = [scheme["name"] for scheme in registry.schemes_in_category("employment")][:2]
+        else:
+            schemes = [scheme["name"] for scheme in registry.schemes_in_category(issue_type)]
+        return {
+            "issue_type": issue_type,
+            "relevant_schemes": schemes,
+            "required_info": ["monthly_income", "family_size", "location"],
+            "confidence": round(0.5 + 0.1 * min(scores[best], 4), 2)
+        }
+
+    def _eligibility(self, prompt: str) -> Dict[str, Any]:
+        match = re.search(r"Scheme: (.+)", prompt)
+        scheme_name = match.group(1).strip() if match else ""
+        return self._verdict(scheme_name, _user_info(prompt))
+
+    def _eligibility_many(self, prompt: str) -> List[Dict[str, Any]]:
+        start = prompt.index("Schemes: [") + len("Schemes: ")
+        scheme_names, _ = json.JSONDecoder().raw_decode(prompt[start:])
+        user_info = _user_info(prompt)
+        return [{"scheme": name, **self._verdict(name, user_info)} for name in scheme_names]
+
+    def _verdict(self, scheme_name: str, user_info: Dict[str, Any]) -> Dict[str, Any]:
+        from multi_agents import get_scheme_registry
+
+        rules = get_scheme_registry().rules_for(scheme_name)
+        if rules is None:
+            return {
+                "eligible": False,
+                "reason": f"{scheme_name} is not a scheme I know about",
+                "missing_requirements": [],
+                "next_steps": ["Check the scheme name"]
+            }
+        verdict = rules.evaluate(user_info)
+        return {
+            "eligible": verdict.eligible,
+            "reason": " ".join(verdict.reasons) or "Based on the information provided",
+            "missing_requirements": verdict.missing_requirements,
+            "next_steps": ["Gather your CNIC and income documents", "Apply through the official portal"]
+        }
+
+    def _text(self, prompt: str) -> str:
+        words = len(prompt.split())
+        return (
+            "Assalam-o-Alaikum! Aapke sawal ka jawab yeh hai. "
+            f"Main ne aapki {words} lafzon ki maloomat dekhi hain. "
+            "Apne qareebi government office ya helpline se rabta karein, "
+            "aur apna CNIC aur income ke documents saath rakhein."
+        )
+
+
+def _user_info(prompt: str) -> Dict[str, Any]:
+    """Extract the JSON user information embedded in an eligibility prompt."""
+    start = prompt.index("User Information:") + len("User Information:")
+    try:
+        user_info, _ = json.JSONDecoder().raw_decode(prompt[start:].lstrip())
+    except ValueError:
+        return {}
+    return user_info if isinstance(user_info, dict) else {}
+
+
+if __name__ == "__main__":
+    # Load test of the agent pipeline against the fake backend
+    import argparse
+    from concurrent.futures import ThreadPoolExecutor
+
+    parser = argparse.ArgumentParser(description="Benchmark the agent pipeline against the fake model.")
+    parser.add_argument("--requests", type=int, default=200, help="number of citizen requests")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight at once")
+    parser.add_argument("--distinct-issues", type=int, default=20, help="distinct issue texts (repeats hit the cache)")
+    args = parser.parse_args()
+
+    os.environ['LLM_BACKEND'] = 'fake'
+    from multi_agents import AgentOrchestrator, PROMPT_STATS, get_model_provider
+
+    orchestrator = AgentOrchestrator()
+    issues = [
+        "I need help with school fees for my children",
+        "Mujhe ghar ke liye loan chahiye",
+        "My mother needs hospital treatment",
+        "I lost my job and need cash support",
+    ]
+    rng = random.Random(0)
+    workload = [
+        (f"{issues[index % len(issues)]} (case {index % args.distinct_issues})",
+         {"monthly_income": rng.randrange(10000, 80000, 5000), "family_size": rng.randint(1, 9),
+          "number_of_children": rng.randint(0, 5), "age": rng.randint(18, 60)})
+        for index in range(args.requests)
+    ]
+
+    def _timed(job):
+        start = time.perf_counter()
+        result = orchestrator.solve_user_issue(*job)
+        sources = [result["issue_analysis"]["source"]] + [
+            entry["eligibility"]["source"] for entry in result["eligibility_results"]
+        ]
+        return time.perf_counter() - start, sources
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        timings = list(pool.map(_timed, workload))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in timings)
+    sources = [source for _, request_sources in timings for source in request_sources]
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+    provider = get_model_provider()
+    print(f"{args.requests} requests in {elapsed:.2f}s ({args.requests / elapsed:.1f} req/s), "
+          f"p50 {percentile(0.5) * 1000:.0f}ms, p95 {percentile(0.95) * 1000:.0f}ms, p99 {percentile(0.99) * 1000:.0f}ms")
+    print(f"Answers from the model: {sources.count('llm')}/{len(sources)}")
+    print(f"Cache: {provider.cache_stats()}")
+    print(f"Breaker: {provider.breaker_stats()}")
+    print(f"Prompts: {PROMPT_STATS.snapshot()}")
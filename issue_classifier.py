@@ -0,0 +1,243 @@
+"""
+Issue type classifier for Citizen Bot Pakistan
+A multinomial logistic regression over hashed word and character n-grams.
+The model is a (features x classes) NumPy weight matrix, so a batch of issues
+is scored with one sparse-dense product. It is trained offline from labelled
+/submit-issue logs and saved as a compact .npz file.
+"""
+
+import re
+import zlib
+from typing import Dict, List, Any, Iterable, Optional, Sequence, Tuple
+
+# NumPy holds the model and does the scoring
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+DEFAULT_NUM_FEATURES = 2 ** 16
+# Character n-grams of each word make Roman-Urdu spelling variants share features
+CHAR_NGRAM = 3
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def hashed_features(text: str, num_features: int = DEFAULT_NUM_FEATURES) -> Dict[int, float]:
+    """Return the L2-normalized signed hashed n-gram vector of a text, as {index: value}.
+
+    Features are word unigrams and bigrams plus character n-grams of each
+    word. CRC32 keeps the hashing identical across processes and restarts.
+    """
+    tokens = TOKEN_PATTERN.findall(text.casefold())
+    grams = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    for token in tokens:
+        padded = f"<{token}>"
+        grams.extend(f"#{padded[start:start + CHAR_NGRAM]}" for start in range(len(padded) - CHAR_NGRAM + 1))
+
+    features = {}
+    for gram in grams:
+        digest = zlib.crc32(gram.encode("utf-8"))
+        index = digest % num_features
+        # The top bit picks the sign, so colliding grams tend to cancel rather than add up
+        features[index] = features.get(index, 0.0) + (-1.0 if digest & 0x80000000 else 1.0)
+
+    norm = sum(value * value for value in features.values()) ** 0.5
+    if norm:
+        features = {index: value / norm for index, value in features.items() if value}
+    return features
+
+
+def featurize(texts: Sequence[str], num_features: int = DEFAULT_NUM_FEATURES) -> Tuple[Any, Any, Any]:
+    """Return the sparse batch (row ids, feature indices, values) of several texts."""
+    rows, indices, values = [], [], []
+    for row, text in enumerate(texts):
+        features = hashed_features(text, num_features)
+        rows.extend([row] * len(features))
+        indices.extend(features)
+        values.extend(features.values())
+    return np.asarray(rows, dtype=np.int64), np.asarray(indices, dtype=np.int64), np.asarray(values, dtype=np.float32)
+
+
+def _sparse_dot(batch: Tuple[Any, Any, Any], size: int, weights: Any) -> Any:
+    """Multiply an (size x features) sparse batch by a (features x classes) dense matrix."""
+    rows, indices, values = batch
+    contributions = weights[indices] * values[:, None]
+    return np.stack([
+        np.bincount(rows, weights=contributions[:, column], minlength=size)
+        for column in range(weights.shape[1])
+    ], axis=1)
+
+
+def _softmax(logits: Any) -> Any:
+    shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+class IssueClassifier:
+    """Hashed-feature linear classifier with temperature-calibrated probabilities."""
+
+    def __init__(self, weights: Any, bias: Any, labels: Sequence[str], temperature: float = 1.0):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy is required for the issue classifier")
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.labels = tuple(str(label) for label in labels)
+        self.temperature = float(temperature)
+        if self.weights.shape[1] != len(self.labels) or self.bias.shape != (len(self.labels),):
+            raise ValueError("Weights, bias and labels disagree on the number of classes")
+
+    @property
+    def num_features(self) -> int:
+        return self.weights.shape[0]
+
+    def predict_proba(self, texts: Sequence[str]) -> Any:
+        """Return an (N, classes) matrix of calibrated class probabilities, columns in ``labels`` order."""
+        logits = _sparse_dot(featurize(texts, self.num_features), len(texts), self.weights) + self.bias
+        return _softmax(logits / self.temperature)
+
+    def predict_batch(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """Return (issue_type, confidence) for every text, scored together."""
+        if not texts:
+            return []
+        probabilities = self.predict_proba(texts)
+        best = probabilities.argmax(axis=1)
+        return [(self.labels[column], float(probabilities[row, column])) for row, column in enumerate(best)]
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Return (issue_type, confidence) for one issue text."""
+        return self.predict_batch([text])[0]
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str], num_features: int = DEFAULT_NUM_FEATURES,
+              epochs: int = 300, learning_rate: float = 2.0, l2: float = 1e-4,
+              validation_fraction: float = 0.2, seed: int = 0) -> "IssueClassifier":
+        """Fit the model with full-batch gradient descent on softmax cross-entropy.
+
+        With enough examples a validation split is held out and used to pick
+        the softmax temperature that makes the confidences calibrated.
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy is required for the issue classifier")
+        if len(texts) != len(labels) or not texts:
+            raise ValueError("Need the same, non-zero number of texts and labels")
+
+        classes = sorted(set(labels))
+        targets = np.asarray([classes.index(label) for label in labels])
+        order = np.random.default_rng(seed).permutation(len(texts))
+        held_out = int(len(texts) * validation_fraction) if len(texts) >= 50 and len(classes) > 1 else 0
+        train_rows, validation_rows = order[held_out:], order[:held_out]
+
+        train_texts = [texts[row] for row in train_rows]
+        batch = featurize(train_texts, num_features)
+        one_hot = np.eye(len(classes), dtype=np.float32)[targets[train_rows]]
+        weights = np.zeros((num_features, len(classes)), dtype=np.float32)
+        bias = np.zeros(len(classes), dtype=np.float32)
+        rows, indices, values = batch
+        size = len(train_texts)
+        for _ in range(epochs):
+            error = (_softmax(_sparse_dot(batch, size, weights) + bias) - one_hot) / size
+            gradient = np.zeros_like(weights)
+            np.add.at(gradient, indices, error[rows] * values[:, None])
+            weights -= learning_rate * (gradient + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+
+        model = cls(weights, bias, classes)
+        if held_out:
+            model.temperature = model._fit_temperature(
+                [texts[row] for row in validation_rows], targets[validation_rows]
+            )
+        return model
+
+    def _fit_temperature(self, texts: Sequence[str], targets: Any) -> float:
+        """Pick the temperature with the lowest validation log-loss."""
+        logits = _sparse_dot(featurize(texts, self.num_features), len(texts), self.weights) + self.bias
+        best_temperature, best_loss = 1.0, float("inf")
+        for temperature in np.exp(np.linspace(np.log(0.25), np.log(4.0), 41)):
+            probabilities = _softmax(logits / temperature)
+            loss = -np.log(probabilities[np.arange(len(targets)), targets] + 1e-12).mean()
+            if loss < best_loss:
+                best_temperature, best_loss = float(temperature), loss
+        return best_temperature
+
+    def save(self, path: str) -> None:
+        """Write the model to a compressed .npz file."""
+        np.savez_compressed(
+            path,
+            weights=self.weights.astype(np.float16),
+            bias=self.bias,
+            labels=np.asarray(self.labels),
+            temperature=np.float32(self.temperature)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IssueClassifier":
+        """Read a model written by save."""
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy is required for the issue classifier")
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["weights"], data["bias"], data["labels"].tolist(), float(data["temperature"]))
+
+
+def labelled_examples(records: Iterable[Dict[str, Any]]) -> Tuple[List[str], List[str]]:
+    """Pick (issue, issue_type) pairs out of log records.
+
+    A record is either {"issue", "issue_type"} or a logged /submit-issue
+    exchange, {"issue", "response": {"issue_analysis": {"issue_type"}}}.
+    """
+    texts, labels = [], []
+    for record in records:
+        issue = record.get("issue")
+        label = record.get("issue_type") or record.get("response", {}).get("issue_analysis", {}).get("issue_type")
+        if isinstance(issue, str) and issue.strip() and isinstance(label, str) and label:
+            texts.append(issue)
+            labels.append(label)
+    return texts, labels
+
+
+def accuracy(model: IssueClassifier, texts: Sequence[str], labels: Sequence[str]) -> Optional[float]:
+    """Fraction of texts the model labels correctly; None for no texts."""
+    if not texts:
+        return None
+    predictions = model.predict_batch(texts)
+    return sum(predicted == label for (predicted, _), label in zip(predictions, labels)) / len(texts)
+
+
+if __name__ == "__main__":
+    # Offline training from labelled JSONL logs, and ad-hoc predictions
+    import argparse
+    import json
+    import time
+
+    parser = argparse.ArgumentParser(description="Train or try the issue type classifier.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train_parser = commands.add_parser("train", help="fit a model on JSONL logs")
+    train_parser.add_argument("logs", help="JSONL file of {issue, issue_type} or logged /submit-issue records")
+    train_parser.add_argument("--output", default="issue_classifier.npz", help="where to write the model")
+    train_parser.add_argument("--features", type=int, default=DEFAULT_NUM_FEATURES, help="hashed feature count")
+    train_parser.add_argument("--epochs", type=int, default=300)
+    predict_parser = commands.add_parser("predict", help="classify issue texts")
+    predict_parser.add_argument("model", help=".npz model file")
+    predict_parser.add_argument("issues", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        with open(args.logs, encoding="utf-8") as logs:
+            texts, labels = labelled_examples(json.loads(line) for line in logs if line.strip())
+        start = time.perf_counter()
+        model = IssueClassifier.train(texts, labels, num_features=args.features, epochs=args.epochs)
+        print(f"Trained on {len(texts)} issues in {time.perf_counter() - start:.1f}s, "
+              f"labels {', '.join(model.labels)}, temperature {model.temperature:.2f}")
+        print(f"Training accuracy: {accuracy(model, texts, labels):.3f}")
+        model.save(args.output)
+        print(f"Saved {args.output}")
+    else:
+        model = IssueClassifier.load(args.model)
+        start = time.perf_counter()
+        predictions = model.predict_batch(args.issues)
+        elapsed = time.perf_counter() - start
+        for issue, (label, confidence) in zip(args.issues, predictions):
+            print(f"{label:<12} {confidence:.2f}  {issue}")
+        print(f"{len(args.issues)} issues in {elapsed * 1000:.2f}ms")
@@ -0,0 +1,99 @@
+"""
+Background jobs for Citizen Bot Pakistan
+Runs submitted work on a bounded thread pool and keeps each job's status,
+partial stage results and final result in a PersistentLRUCache, so clients
+can poll instead of holding a long request open.
+"""
+
+import copy
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional
+
+from cache_store import PersistentLRUCache
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# A job receives progress(stage_name, partial_result) and returns its final result
+JobFunc = Callable[[Callable[[str, Dict[str, Any]], None]], Dict[str, Any]]
+
+
+class JobQueueFullError(Exception):
+    """Raised when too many jobs are already queued or running."""
+
+
+class JobStore:
+    """Bounded job runner with TTL-expiring, optionally SQLite-backed job records."""
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 100, ttl_seconds: float = 3600,
+                 sqlite_path: Optional[str] = None, max_entries: int = 10000):
+        self.max_pending = max_pending
+        self.records = PersistentLRUCache(
+            max_entries=max_entries, ttl_seconds=ttl_seconds, sqlite_path=sqlite_path, table="jobs"
+        )
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._counters = {"submitted": 0, "rejected": 0, JOB_DONE: 0, JOB_FAILED: 0}
+
+    def submit(self, func: JobFunc) -> str:
+        """Queue func and return its job id; raises JobQueueFullError when the queue is full."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._counters["rejected"] += 1
+                raise JobQueueFullError(f"{self._pending} jobs already pending")
+            self._pending += 1
+            self._counters["submitted"] += 1
+
+        record = {
+            "job_id": uuid.uuid4().hex,
+            "status": JOB_QUEUED,
+            "submitted_at": time.time(),
+            "completed_stages": [],
+            "partial": {},
+            "result": None,
+            "error": None
+        }
+        self._save(record)
+        self._executor.submit(self._run, record, func)
+        return record["job_id"]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job record, or None if it is unknown or expired."""
+        return self.records.get(job_id, fresh=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and job counters."""
+        with self._lock:
+            return {"pending": self._pending, "max_pending": self.max_pending, **self._counters}
+
+    def _run(self, record: Dict[str, Any], func: JobFunc) -> None:
+        record["status"] = JOB_RUNNING
+        self._save(record)
+
+        def progress(stage_name: str, partial: Dict[str, Any]) -> None:
+            record["completed_stages"].append(stage_name)
+            record["partial"] = partial
+            self._save(record)
+
+        try:
+            record["result"] = func(progress)
+            record["status"] = JOB_DONE
+        except Exception as e:
+            record["error"] = str(e)
+            record["status"] = JOB_FAILED
+        finally:
+            self._save(record)
+            with self._lock:
+                self._pending -= 1
+                self._counters[record["status"]] += 1
+
+    def _save(self, record: Dict[str, Any]) -> None:
+        # Store a snapshot, so readers never see the worker's record mid-update
+        record["updated_at"] = time.time()
+        self.records.set(record["job_id"], copy.deepcopy(record))
@@ -0,0 +1,106 @@
+"""
+Multi-keyword matcher for Citizen Bot Pakistan
+Compiles a labelled keyword lexicon into an Aho-Corasick automaton, so every
+keyword occurrence in a text is found in one pass whose cost does not grow
+with the size of the lexicon.
+"""
+
+from collections import deque
+from typing import Dict, Hashable, Iterable, Iterator, Mapping, Set, Tuple
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over keywords grouped under labels.
+
+    Matching is case-insensitive and respects word boundaries: the characters
+    around a match must not be letters or digits, except that one trailing
+    "s" is allowed so plurals match ("card" matches "cards" but not
+    "discarded"). A keyword may appear under several labels.
+    """
+
+    def __init__(self, lexicon: Mapping[Hashable, Iterable[str]]):
+        self.keywords = []  # keyword id -> casefolded keyword
+        self._labels = []  # keyword id -> labels it belongs to
+        ids = {}
+        for label, keywords in lexicon.items():
+            for keyword in keywords:
+                keyword = keyword.casefold().strip()
+                if not keyword:
+                    continue
+                if keyword not in ids:
+                    ids[keyword] = len(self.keywords)
+                    self.keywords.append(keyword)
+                    self._labels.append([])
+                if label not in self._labels[ids[keyword]]:
+                    self._labels[ids[keyword]].append(label)
+        self.labels = tuple(lexicon)
+
+        # Trie, failure links and per-state outputs (including those reached through failure links)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for keyword_id, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = self._goto[state][char] = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(keyword_id)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find(self, text: str) -> Iterator[Tuple[str, int]]:
+        """Yield (keyword, start offset in the casefolded text) for every whole-word occurrence."""
+        for keyword_id, start in self._scan(text):
+            yield self.keywords[keyword_id], start
+
+    def match(self, text: str) -> Dict[Hashable, Set[str]]:
+        """Return the distinct keywords found in text, grouped by label (labels without any are left out)."""
+        found = {}
+        for keyword_id in {keyword_id for keyword_id, _ in self._scan(text)}:
+            for label in self._labels[keyword_id]:
+                found.setdefault(label, set()).add(self.keywords[keyword_id])
+        return found
+
+    def counts(self, text: str) -> Dict[Hashable, int]:
+        """Return how many distinct keywords of each label occur in text (0 for labels with none)."""
+        counts = dict.fromkeys(self.labels, 0)
+        for keyword_id in {keyword_id for keyword_id, _ in self._scan(text)}:
+            for label in self._labels[keyword_id]:
+                counts[label] += 1
+        return counts
+
+    def _scan(self, text: str) -> Iterator[Tuple[int, int]]:
+        text = text.casefold()
+        goto, fail, output, keywords = self._goto, self._fail, self._output, self.keywords
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for keyword_id in output[state]:
+                start = index + 1 - len(keywords[keyword_id])
+                if _is_whole_word(text, start, index + 1):
+                    yield keyword_id, start
+
+
+def _is_whole_word(text: str, start: int, end: int) -> bool:
+    if start > 0 and text[start - 1].isalnum():
+        return False
+    if end < len(text) and text[end].isalnum():
+        # Allow a plural "s", but nothing longer
+        return text[end] == "s" and (end + 1 == len(text) or not text[end + 1].isalnum())
+    return True
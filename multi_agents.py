@@ -5,7 +5,26 @@ This module contains specialized AI agents that work together to help citizens.
 
 import os
 import json
-from typing import Dict, List, Any
+import copy
+import asyncio
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait, FIRST_COMPLETED
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, List, Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator, Optional, Tuple
+
+from cache_store import PersistentLRUCache
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from keyword_matcher import KeywordMatcher
+from eligibility_rules import (
+    CRITERIA_FIELDS, PROFILE_FIELDS, REASON_MISSING_INFORMATION, SchemeRules, SchemeThresholds,
+    changed_profile_fields, compile_rules, conflicting_profile_fields
+)
+from pipeline import Pipeline, Stage, StageStats
+from scheme_retrieval import NUMPY_AVAILABLE as RETRIEVAL_AVAILABLE, SchemeIndex
+from single_flight import AsyncSingleFlight, SingleFlight
 
 # Try to import vertexai, fallback if not available
 try:
@@ -22,11 +41,16 @@ except ImportError:
 if not os.environ.get('GOOGLE_APPLICATION_CREDENTIALS'):
     os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'service-account-key.json'
 
+# "vertex": Gemini on Vertex AI; "fake": local stand-in from fake_model.py for load tests
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'vertex').lower()
+
 # Check if we're in fallback mode
-FALLBACK_MODE = os.environ.get('FALLBACK_MODE', 'false').lower() == 'true' or not VERTEXAI_AVAILABLE
+FALLBACK_MODE = os.environ.get('FALLBACK_MODE', 'false').lower() == 'true' or (
+    LLM_BACKEND != 'fake' and not VERTEXAI_AVAILABLE
+)
 
 # Initialize Vertex AI with project ID and location (only if not in fallback mode)
-if not FALLBACK_MODE and VERTEXAI_AVAILABLE:
+if not FALLBACK_MODE and LLM_BACKEND == 'vertex' and VERTEXAI_AVAILABLE:
     try:
         vertexai.init(project="ultimate-realm-473419-c7", location="us-central1")
     except Exception as e:
@@ -35,183 +59,898 @@ if not FALLBACK_MODE and VERTEXAI_AVAILABLE:
         FALLBACK_MODE = True
         os.environ['FALLBACK_MODE'] = 'true'
 
+# LLM response cache settings (LLM_CACHE_SIZE=0 disables the cache)
+LLM_CACHE_SIZE = int(os.environ.get('LLM_CACHE_SIZE', '1024'))
+LLM_CACHE_TTL_SECONDS = float(os.environ.get('LLM_CACHE_TTL_SECONDS', '3600'))
+LLM_CACHE_PATH = os.environ.get('LLM_CACHE_PATH') or None
+# Model eligibility verdicts memoized per (scheme, catalogue version, fields the scheme reads); 0 disables
+ELIGIBILITY_MEMO_SIZE = int(os.environ.get('ELIGIBILITY_MEMO_SIZE', '4096'))
 
-class PolicyAgent:
-    """Agent responsible for understanding government policies and schemes."""
+# Trained issue_type classifier (.npz from issue_classifier.py); unset keeps the keyword heuristic
+ISSUE_CLASSIFIER_PATH = os.environ.get('ISSUE_CLASSIFIER_PATH') or None
+
+# Rule-based answers at or above this confidence skip the model; above 1 sends everything to the model
+ROUTING_CONFIDENCE_THRESHOLD = float(os.environ.get('ROUTING_CONFIDENCE_THRESHOLD', '0.8'))
+
+# Schemes retrieved per issue on top of the fixed per-category lists, and the cap on any analysis' scheme list (0 disables)
+SCHEME_RETRIEVAL_TOP_K = int(os.environ.get('SCHEME_RETRIEVAL_TOP_K', '4'))
+
+# Per-request cap on concurrent scheme checks, and the shared thread pool they run on
+ELIGIBILITY_CONCURRENCY = int(os.environ.get('ELIGIBILITY_CONCURRENCY', '4'))
+# "parallel": one model call per scheme; "batched": one model call covering every scheme
+ELIGIBILITY_MODE = os.environ.get('ELIGIBILITY_MODE', 'parallel').lower()
+
+# "compact": send the precomputed catalogue digest; "full": send the whole catalogue
+POLICY_PROMPT_MODE = os.environ.get('POLICY_PROMPT_MODE', 'compact').lower()
+# With a compact prompt, only include the top-k keyword categories (0 = all categories)
+POLICY_PROMPT_TOP_K = int(os.environ.get('POLICY_PROMPT_TOP_K', '0'))
+AGENT_THREAD_POOL_SIZE = int(os.environ.get('AGENT_THREAD_POOL_SIZE', '32'))
+PIPELINE_THREAD_POOL_SIZE = int(os.environ.get('PIPELINE_THREAD_POOL_SIZE', '32'))
+
+# Per-request latency budget for model calls; at the deadline the rule-based answer is used (0 = wait)
+LLM_DEADLINE_SECONDS = float(os.environ.get('LLM_DEADLINE_SECONDS', '1.5'))
+LLM_THREAD_POOL_SIZE = int(os.environ.get('LLM_THREAD_POOL_SIZE', '32'))
+
+# Circuit breaker shared by every agent's model calls (LLM_BREAKER_MIN_CALLS=0 disables it)
+LLM_BREAKER_FAILURE_RATE = float(os.environ.get('LLM_BREAKER_FAILURE_RATE', '0.5'))
+LLM_BREAKER_WINDOW = int(os.environ.get('LLM_BREAKER_WINDOW', '20'))
+LLM_BREAKER_MIN_CALLS = int(os.environ.get('LLM_BREAKER_MIN_CALLS', '5'))
+LLM_BREAKER_OPEN_SECONDS = float(os.environ.get('LLM_BREAKER_OPEN_SECONDS', '30'))
+LLM_BREAKER_HALF_OPEN_PROBES = int(os.environ.get('LLM_BREAKER_HALF_OPEN_PROBES', '1'))
+
+# Identical concurrent submissions share one solve_user_issue computation
+REQUEST_COALESCING = os.environ.get('REQUEST_COALESCING', 'true').lower() == 'true'
+
+# Batch submissions: records solved at once, and how many recent records duplicates are matched against
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '8'))
+BATCH_DEDUPE_WINDOW = int(os.environ.get('BATCH_DEDUPE_WINDOW', '1024'))
+
+
+SCHEME_POLICIES = {
+    "education_schemes": [
+        {
+            "name": "Ehsaas Education Grant",
+            "min_children": 2,
+            "max_monthly_income": 30000,
+            "description": "Provides monthly stipend for families with school-aged children",
+            "benefits": "Monthly stipend of PKR 2,000 per child, school supplies, uniform allowance",
+            "required_documents": ["CNIC", "Children's birth certificates", "School enrollment proof", "Income certificate", "Bank account details"],
+            "application_process": "Online application through Ehsaas portal or visit local Ehsaas center",
+            "helpline": "0800-26477",
+            "website": "https://ehsaas.gov.pk"
+        },
+        {
+            "name": "Prime Minister's Education Initiative",
+            "min_children": 1,
+            "max_monthly_income": 40000,
+            "description": "Supports education expenses for eligible families",
+            "benefits": "Educational stipend, laptop/tablet for students, scholarship opportunities",
+            "required_documents": ["CNIC", "Student ID", "Academic records", "Income certificate", "Family registration certificate"],
+            "application_process": "Apply through PM Education Portal or district education office",
+            "helpline": "0800-12345",
+            "website": "https://pm-education.gov.pk"
+        },
+        {
+            "name": "Benazir Income Support Programme (BISP)",
+            "min_children": 1,
+            "max_monthly_income": 25000,
+            "description": "Cash transfer program for poor families",
+            "benefits": "Monthly cash transfer of PKR 2,000, health insurance, education stipend",
+            "required_documents": ["CNIC", "Family registration certificate", "Income certificate", "Bank account details", "Children's birth certificates"],
+            "application_process": "Registration at BISP center or online through BISP portal",
+            "helpline": "0800-26477",
+            "website": "https://bisp.gov.pk"
+        }
+    ],
+    "housing_schemes": [
+        {
+            "name": "Naya Pakistan Housing Scheme",
+            "min_monthly_income": 25000,
+            "max_monthly_income": 60000,
+            "credit_check_required": True,
+            "description": "Provides low-cost housing loans",
+            "benefits": "Low-interest housing loan up to PKR 2.5 million, flexible payment terms",
+            "required_documents": ["CNIC", "Income certificate", "Bank statements", "Employment letter", "Credit report", "Property documents"],
+            "application_process": "Apply through Naya Pakistan Housing Portal or visit designated banks",
+            "helpline": "0800-12345",
+            "website": "https://nphda.gov.pk"
+        },
+        {
+            "name": "Apna Ghar Scheme",
+            "min_monthly_income": 20000,
+            "max_monthly_income": 50000,
+            "description": "Affordable housing for low-income families",
+            "benefits": "Subsidized housing units, low down payment, government guarantee",
+            "required_documents": ["CNIC", "Income certificate", "Family registration certificate", "Bank account details", "Employment proof"],
+            "application_process": "Apply through Apna Ghar portal or visit local housing authority",
+            "helpline": "0800-98765",
+            "website": "https://apnaghar.gov.pk"
+        }
+    ],
+    "healthcare_schemes": [
+        {
+            "name": "Sehat Card Plus",
+            "income_limit": 50000,
+            "description": "Free healthcare coverage for eligible families",
+            "benefits": "Free treatment at government hospitals, emergency care, specialist consultations",
+            "required_documents": ["CNIC", "Family registration certificate", "Income certificate", "Recent photograph"],
+            "application_process": "Apply at Sehat Card centers or through online portal",
+            "helpline": "0800-12345",
+            "website": "https://sehatcard.gov.pk"
+        },
+        {
+            "name": "Ehsaas Health Insurance",
+            "income_limit": 30000,
+            "description": "Health insurance for poor families",
+            "benefits": "Health insurance coverage, cashless treatment, medicine allowance",
+            "required_documents": ["CNIC", "Income certificate", "Family registration certificate", "Bank account details"],
+            "application_process": "Apply through Ehsaas portal or visit Ehsaas center",
+            "helpline": "0800-26477",
+            "website": "https://ehsaas.gov.pk"
+        }
+    ],
+    "employment_schemes": [
+        {
+            "name": "Ehsaas Emergency Cash",
+            "income_limit": 20000,
+            "description": "Emergency financial assistance",
+            "benefits": "One-time cash assistance of PKR 12,000, immediate relief",
+            "required_documents": ["CNIC", "Income certificate", "Emergency situation proof", "Bank account details"],
+            "application_process": "Apply through Ehsaas emergency portal or SMS service",
+            "helpline": "0800-26477",
+            "website": "https://ehsaas.gov.pk"
+        },
+        {
+            "name": "Kamyab Jawan Program",
+            "min_age": 18,
+            "age_limit": 35,
+            "description": "Youth entrepreneurship and skill development",
+            "benefits": "Business loans up to PKR 5 million, skill training, mentorship",
+            "required_documents": ["CNIC", "Educational certificates", "Business plan", "Bank account details", "Character certificate"],
+            "application_process": "Apply through Kamyab Jawan portal or visit youth centers",
+            "helpline": "0800-12345",
+            "website": "https://kamyabjawan.gov.pk"
+        }
+    ]
+}
+    
+
+
+class SchemeRegistry:
+    """Read-only index over the scheme catalogue, built once and shared by every agent."""
+    
+    def __init__(self, policies: Dict[str, List[Dict[str, Any]]]):
+        self.policies = policies
+        # Content hash, so every process loading the same catalogue agrees on it
+        self.version = hashlib.sha256(
+            json.dumps(policies, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:12]
+        by_name = {}
+        by_category = {}
+        category_of = {}
+        for category, schemes in policies.items():
+            by_category[category] = tuple(schemes)
+            for scheme in schemes:
+                by_name[scheme["name"]] = scheme
+                category_of[scheme["name"]] = category
+        self._by_name = MappingProxyType(by_name)
+        self._by_category = MappingProxyType(by_category)
+        self._category_of = MappingProxyType(category_of)
+        self._rules = MappingProxyType(compile_rules(policies))
+        self._thresholds = None
+        self._retrieval = SchemeIndex.from_policies(policies) if RETRIEVAL_AVAILABLE else None
+        
+        # Minimal per-category digest (name + eligibility thresholds) for model prompts
+        self._digest = MappingProxyType({
+            category: tuple(
+                {"name": scheme["name"], **{key: scheme[key] for key in CRITERIA_FIELDS if key in scheme}}
+                for scheme in schemes
+            )
+            for category, schemes in policies.items()
+        })
+        self._full_digest_prompt = None
+        self._full_digest_prompt = self.catalogue_digest()
+    
+    @property
+    def scheme_names(self) -> Tuple[str, ...]:
+        """All scheme names in catalogue order."""
+        return tuple(self._by_name)
+    
+    def get(self, scheme_name: str) -> Optional[Dict[str, Any]]:
+        """Return the scheme with this exact name, or None."""
+        return self._by_name.get(scheme_name)
+    
+    def category_of(self, scheme_name: str) -> Optional[str]:
+        """Return the catalogue category (e.g. "education_schemes") of a scheme."""
+        return self._category_of.get(scheme_name)
+    
+    def rules_for(self, scheme_name: str) -> Optional[SchemeRules]:
+        """Return the compiled eligibility rules of a scheme, or None."""
+        return self._rules.get(scheme_name)
+    
+    def thresholds(self, scheme_names: Optional[List[str]] = None) -> SchemeThresholds:
+        """Return the columnar thresholds of the given schemes (default: whole catalogue)."""
+        if scheme_names is None:
+            if self._thresholds is None:
+                self._thresholds = SchemeThresholds([self._rules[name] for name in self._by_name])
+            return self._thresholds
+        unknown = [name for name in scheme_names if name not in self._rules]
+        if unknown:
+            raise ValueError(f"Unknown schemes: {', '.join(unknown)}")
+        return SchemeThresholds([self._rules[name] for name in scheme_names])
+    
+    def retrieve(self, text: str, k: int, category: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Return up to k (scheme name, score) pairs most similar to text, favouring a category.
+        
+        Empty when nothing matches or NumPy is unavailable.
+        """
+        if self._retrieval is None:
+            return []
+        if category is not None and not category.endswith("_schemes"):
+            category = f"{category}_schemes"
+        return self._retrieval.top_k(text, k, category)
+    
+    def catalogue_digest(self, categories: Optional[List[str]] = None) -> str:
+        """Return the compact JSON catalogue digest, optionally limited to some categories."""
+        if categories is None and self._full_digest_prompt is not None:
+            return self._full_digest_prompt
+        selected = {
+            category.replace("_schemes", ""): list(entries)
+            for category, entries in self._digest.items()
+            if categories is None or category in categories or category.replace("_schemes", "") in categories
+        }
+        return json.dumps(selected, separators=(",", ":"), ensure_ascii=False)
+    
+    def schemes_in_category(self, category: str) -> Tuple[Dict[str, Any], ...]:
+        """Return the schemes of a category; accepts "education" or "education_schemes"."""
+        if not category.endswith("_schemes"):
+            category = f"{category}_schemes"
+        return self._by_category.get(category, ())
+
+
+SCHEME_REGISTRY = SchemeRegistry(SCHEME_POLICIES)
+
+
+def get_scheme_registry() -> SchemeRegistry:
+    """Return the process-wide scheme registry."""
+    return SCHEME_REGISTRY
+
+
+def reload_scheme_registry(policies: Dict[str, List[Dict[str, Any]]] = None) -> SchemeRegistry:
+    """Rebuild the process-wide registry from a changed catalogue (default: SCHEME_POLICIES).
+    
+    Memoized eligibility verdicts are keyed by the registry version, and the
+    eligibility prompts carry it, so neither the memo nor the response cache
+    serves verdicts made under the old catalogue.
+    """
+    global SCHEME_REGISTRY
+    SCHEME_REGISTRY = SchemeRegistry(SCHEME_POLICIES if policies is None else policies)
+    return SCHEME_REGISTRY
+
+
+async def generate_content_async(model, prompt, **kwargs):
+    """Await the model's async API, or run its blocking generate_content on a worker thread."""
+    if hasattr(model, "generate_content_async"):
+        return await model.generate_content_async(prompt, **kwargs)
+    return await asyncio.to_thread(model.generate_content, prompt, **kwargs)
+
+
+class LazyGenerativeModel:
+    """Gemini model handle that creates the underlying client on first use."""
+    
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+    
+    def _client(self):
+        # Created on first call, i.e. after gunicorn has forked its workers
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = GenerativeModel(self.model_name)
+        return self._model
+    
+    def generate_content(self, *args, **kwargs):
+        return self._client().generate_content(*args, **kwargs)
+    
+    async def generate_content_async(self, *args, **kwargs):
+        return await self._client().generate_content_async(*args, **kwargs)
+
+
+class CircuitBreakerModel:
+    """Routes model calls through a circuit breaker; rejected calls raise CircuitOpenError."""
+    
+    def __init__(self, model, breaker: CircuitBreaker):
+        self.model = model
+        self.breaker = breaker
+    
+    def generate_content(self, *args, **kwargs):
+        return self.breaker.call(self.model.generate_content, *args, **kwargs)
+    
+    async def generate_content_async(self, prompt, **kwargs):
+        return await self.breaker.call_async(generate_content_async, self.model, prompt, **kwargs)
+
+
+class CachedResponse:
+    """Minimal stand-in for a GenerativeModel response served from the cache."""
+    
+    def __init__(self, text: str):
+        self.text = text
+
+
+class CachedGenerativeModel:
+    """Serves repeated prompts from a response cache keyed by model and normalized prompt."""
+    
+    def __init__(self, model, cache: PersistentLRUCache, model_name: str):
+        self.model = model
+        self.cache = cache
+        self.model_name = model_name
+    
+    def cache_key(self, prompt: str) -> str:
+        # Whitespace and case differences do not change what we are asking
+        normalized = " ".join(prompt.split()).casefold()
+        return hashlib.sha256(f"{self.model_name}\0{normalized}".encode("utf-8")).hexdigest()
+    
+    def generate_content(self, prompt, **kwargs):
+        # Streaming and per-call generation settings bypass the cache
+        if kwargs or not isinstance(prompt, str):
+            return self.model.generate_content(prompt, **kwargs)
+        
+        key = self.cache_key(prompt)
+        text = self.cache.get(key)
+        if text is not None:
+            return CachedResponse(text)
+        
+        response = self.model.generate_content(prompt)
+        if response.text:
+            self.cache.set(key, response.text)
+        return response
+    
+    async def generate_content_async(self, prompt, **kwargs):
+        if kwargs or not isinstance(prompt, str):
+            return await generate_content_async(self.model, prompt, **kwargs)
+        
+        key = self.cache_key(prompt)
+        text = self.cache.get(key)
+        if text is not None:
+            return CachedResponse(text)
+        
+        response = await generate_content_async(self.model, prompt)
+        if response.text:
+            self.cache.set(key, response.text)
+        return response
+
+
+class ModelProvider:
+    """Hands every agent the same lazily created Gemini client."""
+    
+    def __init__(self, model_name: str = "gemini-pro", cache: PersistentLRUCache = None,
+                 verdict_memo: PersistentLRUCache = None):
+        self.model_name = model_name
+        self.cache = cache
+        if cache is None and LLM_CACHE_SIZE > 0:
+            self.cache = PersistentLRUCache(
+                max_entries=LLM_CACHE_SIZE,
+                ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                sqlite_path=LLM_CACHE_PATH,
+                table="llm_responses"
+            )
+        self.verdict_memo = verdict_memo
+        if verdict_memo is None and ELIGIBILITY_MEMO_SIZE > 0:
+            self.verdict_memo = PersistentLRUCache(
+                max_entries=ELIGIBILITY_MEMO_SIZE,
+                ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                sqlite_path=LLM_CACHE_PATH,
+                table="eligibility_verdicts"
+            )
+        self.breaker = None
+        if LLM_BREAKER_MIN_CALLS > 0:
+            self.breaker = CircuitBreaker(
+                name="vertex",
+                failure_rate_threshold=LLM_BREAKER_FAILURE_RATE,
+                window_size=LLM_BREAKER_WINDOW,
+                minimum_calls=LLM_BREAKER_MIN_CALLS,
+                open_seconds=LLM_BREAKER_OPEN_SECONDS,
+                half_open_probes=LLM_BREAKER_HALF_OPEN_PROBES
+            )
+        self._model = None
+        self._lock = threading.Lock()
+    
+    def get_model(self):
+        """Return the shared model handle, or None when running in fallback mode."""
+        if FALLBACK_MODE:
+            return None
+        if LLM_BACKEND != "fake" and (not VERTEXAI_AVAILABLE or GenerativeModel is None):
+            return None
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._build_model()
+        return self._model
+    
+    def _build_model(self):
+        # The cache sits outside the breaker, so hits are not counted as breaker calls. While the
+        # breaker is open, agents skip the model path altogether (see uses_model), cache included.
+        model = self._base_model()
+        if self.breaker is not None:
+            model = CircuitBreakerModel(model, self.breaker)
+        if self.cache is not None:
+            model = CachedGenerativeModel(model, self.cache, self.model_name)
+        return model
+    
+    def _base_model(self):
+        if LLM_BACKEND == "fake":
+            from fake_model import FakeGenerativeModel
+            return FakeGenerativeModel.from_env(self.model_name)
+        return LazyGenerativeModel(self.model_name)
+    
+    def accepting_calls(self) -> bool:
+        """False while the circuit breaker is rejecting model calls."""
+        return self.breaker is None or not self.breaker.is_rejecting()
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Return response cache hit/miss counters."""
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.stats()}
+    
+    def breaker_stats(self) -> Dict[str, Any]:
+        """Return circuit breaker state and counters."""
+        if self.breaker is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.breaker.snapshot()}
+    
+    def memo_stats(self) -> Dict[str, Any]:
+        """Return eligibility verdict memo hit/miss counters."""
+        if self.verdict_memo is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.verdict_memo.stats()}
+
+
+MODEL_PROVIDER = ModelProvider()
+
+
+def get_model_provider() -> ModelProvider:
+    """Return the process-wide model provider."""
+    return MODEL_PROVIDER
+
+
+_EXECUTORS = {}
+_EXECUTORS_LOCK = threading.Lock()
+
+
+def _shared_executor(name: str, max_workers: int) -> ThreadPoolExecutor:
+    """Return the process-wide thread pool with this name, creating it on first use."""
+    executor = _EXECUTORS.get(name)
+    if executor is None:
+        with _EXECUTORS_LOCK:
+            executor = _EXECUTORS.get(name)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+                _EXECUTORS[name] = executor
+    return executor
+
+
+def get_agent_executor() -> ThreadPoolExecutor:
+    """Return the thread pool used for concurrent agent calls."""
+    return _shared_executor("agent", AGENT_THREAD_POOL_SIZE)
+
+
+def get_pipeline_executor() -> ThreadPoolExecutor:
+    """Return the thread pool orchestrator stages run on (they wait on the agent and llm pools)."""
+    return _shared_executor("pipeline", PIPELINE_THREAD_POOL_SIZE)
+
+
+def get_llm_executor() -> ThreadPoolExecutor:
+    """Return the thread pool model calls run on (kept apart so agent tasks can wait on it)."""
+    return _shared_executor("llm", LLM_THREAD_POOL_SIZE)
+
+
+def get_batch_executor() -> ThreadPoolExecutor:
+    """Return the thread pool batch records are solved on (they wait on the pipeline pool)."""
+    return _shared_executor("batch", BATCH_CONCURRENCY)
+
+
+def request_deadline(budget_seconds: float = None) -> Optional[float]:
+    """Return a time.monotonic() deadline for a new request, or None when unbounded."""
+    budget_seconds = LLM_DEADLINE_SECONDS if budget_seconds is None else budget_seconds
+    return time.monotonic() + budget_seconds if budget_seconds > 0 else None
+
+
+def hedged_call(model_call: Callable[[], Any], fallback_result: Any,
+                deadline: Optional[float], is_valid: Callable[[Any], bool]) -> Tuple[Any, str]:
+    """Race a model call against a deadline; returns (result, source).
+    
+    The rule-based fallback_result is computed by the caller up front. If the
+    model returns a valid answer before the deadline it wins ("llm"),
+    otherwise the fallback is returned ("rules"). A late model call keeps
+    running in the background, so its response can still fill the cache.
+    When the deadline has already passed, the model is not called at all.
+    """
+    if _deadline_passed(deadline):
+        return fallback_result, "rules"
+    future = get_llm_executor().submit(model_call)
+    timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+    return _hedge_outcome(lambda: future.result(timeout=timeout), fallback_result, is_valid)
+
+
+_BACKGROUND_TASKS = set()
+
+
+async def hedged_call_async(model_call: Callable[[], Awaitable[Any]], fallback_result: Any,
+                            deadline: Optional[float], is_valid: Callable[[Any], bool]) -> Tuple[Any, str]:
+    """Async counterpart of hedged_call; model_call returns an awaitable."""
+    if _deadline_passed(deadline):
+        return fallback_result, "rules"
+    task = asyncio.ensure_future(model_call())
+    timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+    done, _ = await asyncio.wait({task}, timeout=timeout)
+    if not done:
+        # Hold a reference so the late call can finish (and fill the cache) instead of being collected
+        _BACKGROUND_TASKS.add(task)
+        task.add_done_callback(_BACKGROUND_TASKS.discard)
+        task.add_done_callback(lambda finished: finished.cancelled() or finished.exception())
+        print("⏱️  Model call missed the deadline, using rule-based result")
+        return fallback_result, "rules"
+    return _hedge_outcome(task.result, fallback_result, is_valid)
+
+
+def _deadline_passed(deadline: Optional[float]) -> bool:
+    # A call that cannot win would only hold an llm pool thread while the model is slow
+    if deadline is not None and deadline <= time.monotonic():
+        print("⏱️  Request deadline already passed, using rule-based result without calling the model")
+        return True
+    return False
+
+
+def _hedge_outcome(get_result: Callable[[], Any], fallback_result: Any,
+                   is_valid: Callable[[Any], bool]) -> Tuple[Any, str]:
+    """Return (model result, "llm"), or (fallback_result, "rules") if it is late, failed or invalid."""
+    try:
+        result = get_result()
+    except FutureTimeoutError:
+        print("⏱️  Model call missed the deadline, using rule-based result")
+        return fallback_result, "rules"
+    except CircuitOpenError:
+        print("🔌 Model circuit is open, using rule-based result")
+        return fallback_result, "rules"
+    except Exception as e:
+        print(f"⚠️  Model call failed: {e}")
+        return fallback_result, "rules"
+    if not is_valid(result):
+        print("⚠️  Model returned an invalid result, using rule-based result")
+        return fallback_result, "rules"
+    return result, "llm"
+
+
+def run_bounded(func: Callable[[Any], Any], items: List[Any], max_concurrency: int) -> List[Any]:
+    """Apply func to every item on the shared pool, at most max_concurrency at a time.
+    
+    Results come back in the order of items, whatever order the calls finish in.
+    """
+    if max_concurrency <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    
+    executor = get_agent_executor()
+    results = [None] * len(items)
+    pending = {}
+    next_index = 0
+    while next_index < len(items) or pending:
+        while next_index < len(items) and len(pending) < max_concurrency:
+            pending[executor.submit(func, items[next_index])] = next_index
+            next_index += 1
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[pending.pop(future)] = future.result()
+    return results
+
+
+def parse_model_json(text: str) -> Any:
+    """Parse a JSON model response, tolerating a surrounding ```json fence."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    return json.loads(text)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt token count (about four characters per token for Gemini)."""
+    return (len(text) + 3) // 4
+
+
+class PromptStats:
+    """Thread-safe per-prompt token counters."""
     
     def __init__(self):
-        if not FALLBACK_MODE and VERTEXAI_AVAILABLE and GenerativeModel:
-            try:
-                self.model = GenerativeModel("gemini-pro")
-            except Exception as e:
-                print(f"⚠️  Warning: Could not initialize Gemini model: {e}")
-                self.model = None
-        else:
-            self.model = None
-        self.policies = {
-            "education_schemes": [
-                {
-                    "name": "Ehsaas Education Grant",
-                    "min_children": 2,
-                    "max_monthly_income": 30000,
-                    "description": "Provides monthly stipend for families with school-aged children",
-                    "benefits": "Monthly stipend of PKR 2,000 per child, school supplies, uniform allowance",
-                    "required_documents": ["CNIC", "Children's birth certificates", "School enrollment proof", "Income certificate", "Bank account details"],
-                    "application_process": "Online application through Ehsaas portal or visit local Ehsaas center",
-                    "helpline": "0800-26477",
-                    "website": "https://ehsaas.gov.pk"
-                },
-                {
-                    "name": "Prime Minister's Education Initiative",
-                    "min_children": 1,
-                    "max_monthly_income": 40000,
-                    "description": "Supports education expenses for eligible families",
-                    "benefits": "Educational stipend, laptop/tablet for students, scholarship opportunities",
-                    "required_documents": ["CNIC", "Student ID", "Academic records", "Income certificate", "Family registration certificate"],
-                    "application_process": "Apply through PM Education Portal or district education office",
-                    "helpline": "0800-12345",
-                    "website": "https://pm-education.gov.pk"
-                },
-                {
-                    "name": "Benazir Income Support Programme (BISP)",
-                    "min_children": 1,
-                    "max_monthly_income": 25000,
-                    "description": "Cash transfer program for poor families",
-                    "benefits": "Monthly cash transfer of PKR 2,000, health insurance, education stipend",
-                    "required_documents": ["CNIC", "Family registration certificate", "Income certificate", "Bank account details", "Children's birth certificates"],
-                    "application_process": "Registration at BISP center or online through BISP portal",
-                    "helpline": "0800-26477",
-                    "website": "https://bisp.gov.pk"
-                }
-            ],
-            "housing_schemes": [
-                {
-                    "name": "Naya Pakistan Housing Scheme",
-                    "min_monthly_income": 25000,
-                    "max_monthly_income": 60000,
-                    "credit_check_required": True,
-                    "description": "Provides low-cost housing loans",
-                    "benefits": "Low-interest housing loan up to PKR 2.5 million, flexible payment terms",
-                    "required_documents": ["CNIC", "Income certificate", "Bank statements", "Employment letter", "Credit report", "Property documents"],
-                    "application_process": "Apply through Naya Pakistan Housing Portal or visit designated banks",
-                    "helpline": "0800-12345",
-                    "website": "https://nphda.gov.pk"
-                },
-                {
-                    "name": "Apna Ghar Scheme",
-                    "min_monthly_income": 20000,
-                    "max_monthly_income": 50000,
-                    "description": "Affordable housing for low-income families",
-                    "benefits": "Subsidized housing units, low down payment, government guarantee",
-                    "required_documents": ["CNIC", "Income certificate", "Family registration certificate", "Bank account details", "Employment proof"],
-                    "application_process": "Apply through Apna Ghar portal or visit local housing authority",
-                    "helpline": "0800-98765",
-                    "website": "https://apnaghar.gov.pk"
-                }
-            ],
-            "healthcare_schemes": [
-                {
-                    "name": "Sehat Card Plus",
-                    "income_limit": 50000,
-                    "description": "Free healthcare coverage for eligible families",
-                    "benefits": "Free treatment at government hospitals, emergency care, specialist consultations",
-                    "required_documents": ["CNIC", "Family registration certificate", "Income certificate", "Recent photograph"],
-                    "application_process": "Apply at Sehat Card centers or through online portal",
-                    "helpline": "0800-12345",
-                    "website": "https://sehatcard.gov.pk"
-                },
-                {
-                    "name": "Ehsaas Health Insurance",
-                    "income_limit": 30000,
-                    "description": "Health insurance for poor families",
-                    "benefits": "Health insurance coverage, cashless treatment, medicine allowance",
-                    "required_documents": ["CNIC", "Income certificate", "Family registration certificate", "Bank account details"],
-                    "application_process": "Apply through Ehsaas portal or visit Ehsaas center",
-                    "helpline": "0800-26477",
-                    "website": "https://ehsaas.gov.pk"
-                }
-            ],
-            "employment_schemes": [
-                {
-                    "name": "Ehsaas Emergency Cash",
-                    "income_limit": 20000,
-                    "description": "Emergency financial assistance",
-                    "benefits": "One-time cash assistance of PKR 12,000, immediate relief",
-                    "required_documents": ["CNIC", "Income certificate", "Emergency situation proof", "Bank account details"],
-                    "application_process": "Apply through Ehsaas emergency portal or SMS service",
-                    "helpline": "0800-26477",
-                    "website": "https://ehsaas.gov.pk"
-                },
-                {
-                    "name": "Kamyab Jawan Program",
-                    "age_limit": 35,
-                    "description": "Youth entrepreneurship and skill development",
-                    "benefits": "Business loans up to PKR 5 million, skill training, mentorship",
-                    "required_documents": ["CNIC", "Educational certificates", "Business plan", "Bank account details", "Character certificate"],
-                    "application_process": "Apply through Kamyab Jawan portal or visit youth centers",
-                    "helpline": "0800-12345",
-                    "website": "https://kamyabjawan.gov.pk"
+        self._lock = threading.Lock()
+        self._stats = {}
+    
+    def record(self, prompt_name: str, prompt: str) -> int:
+        """Record the estimated token count of a prompt and return it."""
+        tokens = estimate_tokens(prompt)
+        with self._lock:
+            entry = self._stats.setdefault(prompt_name, {"count": 0, "total_tokens": 0, "last_tokens": 0})
+            entry["count"] += 1
+            entry["total_tokens"] += tokens
+            entry["last_tokens"] = tokens
+        return tokens
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Return a copy of the counters with average tokens per prompt."""
+        with self._lock:
+            return {
+                name: {**entry, "avg_tokens": round(entry["total_tokens"] / entry["count"], 1)}
+                for name, entry in self._stats.items()
+            }
+
+
+class RoutingStats:
+    """Thread-safe counters of rules-vs-model routing decisions, per agent."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+    
+    def record(self, agent: str, route: str, reason: Optional[str] = None) -> None:
+        """Count one decision; reason says why the request was escalated to the model."""
+        with self._lock:
+            entry = self._stats.setdefault(agent, {"rules": 0, "llm": 0, "escalations": {}})
+            entry[route] += 1
+            if reason:
+                entry["escalations"][reason] = entry["escalations"].get(reason, 0) + 1
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Return a copy of the counters with the share of decisions answered by rules."""
+        with self._lock:
+            return {
+                agent: {
+                    **entry,
+                    "escalations": dict(entry["escalations"]),
+                    "rules_share": round(entry["rules"] / (entry["rules"] + entry["llm"]), 3)
                 }
-            ]
-        }
+                for agent, entry in self._stats.items()
+            }
+
+
+PROMPT_STATS = PromptStats()
+STAGE_STATS = StageStats()
+ROUTING_STATS = RoutingStats()
+
+
+def normalize_issue(user_issue: str) -> str:
+    """Collapse whitespace and case, so trivially different issue texts compare equal."""
+    return " ".join(str(user_issue).split()).casefold()
+
+
+def coalescing_key(user_issue: str, user_info: Dict[str, Any]) -> str:
+    """Key identical submissions by normalized issue text and the whole user_info.
+    
+    Every user_info field reaches the model prompts, so any difference can
+    change the answer and must not share a flight.
+    """
+    return json.dumps([normalize_issue(user_issue), user_info], sort_keys=True, ensure_ascii=False, default=str)
+
+
+def verdict_needs_recheck(scheme_name: str, verdict: Optional[Dict[str, Any]],
+                          previous_user_info: Dict[str, Any], user_info: Dict[str, Any]) -> bool:
+    """True if an eligibility verdict computed for previous_user_info may not hold for user_info.
+    
+    A rule verdict only depends on the profile fields its scheme's rules
+    read; a model verdict may depend on any field.
+    """
+    if verdict is None:
+        return True
+    if verdict.get("source") != "rules":
+        return previous_user_info != user_info
+    rules = get_scheme_registry().rules_for(scheme_name)
+    return rules is not None and bool(rules.fields & changed_profile_fields(previous_user_info, user_info))
+
+
+def eligibility_escalation(scheme_name: str, user_info: Dict[str, Any]) -> Optional[str]:
+    """Return why a scheme's rule verdict should go to the model, or None when the rules settle it."""
+    rules = get_scheme_registry().rules_for(scheme_name)
+    if rules is None:
+        return "unknown_scheme"
+    if rules.fields & conflicting_profile_fields(user_info):
+        return "contradictory_data"
+    if rules.evaluate(user_info).reason_code == REASON_MISSING_INFORMATION:
+        return "missing_information"
+    return None
+
+
+_ISSUE_CLASSIFIER = None
+_ISSUE_CLASSIFIER_LOADED = False
+_ISSUE_CLASSIFIER_LOCK = threading.Lock()
+
+
+def get_issue_classifier():
+    """Return the classifier loaded from ISSUE_CLASSIFIER_PATH, or None if unset or unloadable."""
+    global _ISSUE_CLASSIFIER, _ISSUE_CLASSIFIER_LOADED
+    if not _ISSUE_CLASSIFIER_LOADED:
+        with _ISSUE_CLASSIFIER_LOCK:
+            if not _ISSUE_CLASSIFIER_LOADED:
+                if ISSUE_CLASSIFIER_PATH:
+                    try:
+                        from issue_classifier import IssueClassifier
+                        _ISSUE_CLASSIFIER = IssueClassifier.load(ISSUE_CLASSIFIER_PATH)
+                    except Exception as e:
+                        print(f"⚠️  Could not load issue classifier from {ISSUE_CLASSIFIER_PATH}: {e}")
+                _ISSUE_CLASSIFIER_LOADED = True
+    return _ISSUE_CLASSIFIER
+
+
+# Rule-based issue lexicon: (signal, value) -> keywords, all matched in one pass by ISSUE_MATCHER.
+# Needs are reported in this order; urgency and department take the first value that matched.
+ISSUE_LEXICON = {
+    ("category", "education"): ["education", "school", "student", "study", "children", "kids", "tuition", "fees", "scholarship", "learning"],
+    ("category", "housing"): ["house", "housing", "home", "property", "loan", "mortgage", "apartment", "residence", "accommodation"],
+    ("category", "healthcare"): ["health", "healthcare", "medical", "hospital", "treatment", "doctor", "medicine", "illness", "surgery", "card", "insurance"],
+    ("category", "employment"): ["job", "employment", "work", "income", "money", "cash", "salary", "business", "loan", "entrepreneur", "youth"],
+    ("need", "urgent_assistance"): ["urgent", "emergency", "immediate", "asap"],
+    ("need", "financial_support"): ["financial", "money", "cash", "income"],
+    ("need", "family_support"): ["family", "children", "kids"],
+    ("need", "healthcare_support"): ["medical", "health", "healthcare", "treatment"],
+    ("need", "education_support"): ["education", "school", "study"],
+    ("urgency", "high"): ["urgent", "emergency", "immediate", "asap", "critical", "desperate"],
+    ("urgency", "medium"): ["soon", "quickly", "fast", "priority"],
+    ("department", "Education Department"): ["education", "school", "student", "study"],
+    ("department", "Health Department"): ["health", "healthcare", "medical", "hospital", "treatment"],
+    ("department", "Housing Department"): ["house", "housing", "home", "property"],
+    ("department", "Labor Department"): ["job", "employment", "work", "income"],
+}
+ISSUE_MATCHER = KeywordMatcher(ISSUE_LEXICON)
+
+
+def issue_signals(user_issue: str) -> Dict[str, Any]:
+    """Classify issue text in one pass: category keyword scores, detected needs, urgency level and department."""
+    counts = ISSUE_MATCHER.counts(user_issue)
+    
+    def matched(signal: str) -> List[str]:
+        return [value for (kind, value), count in counts.items() if kind == signal and count]
     
-    def analyze_user_issue(self, user_issue: str) -> Dict[str, Any]:
-        """Analyze user issue and identify relevant policies."""
-        if FALLBACK_MODE or self.model is None:
-            return self._fallback_policy_analysis(user_issue)
+    urgency = matched("urgency")
+    departments = matched("department")
+    return {
+        "scores": {value: count for (kind, value), count in counts.items() if kind == "category"},
+        "needs": matched("need") or ["general_assistance"],
+        "urgency": urgency[0] if urgency else "low",
+        "department": departments[0] if departments else "General Services Department"
+    }
+
+
+class PolicyAgent:
+    """Agent responsible for understanding government policies and schemes."""
+    
+    def __init__(self, model_provider: ModelProvider = None):
+        self.model_provider = model_provider or get_model_provider()
+        self.model = self.model_provider.get_model()
+        self.classifier = get_issue_classifier()
+    
+    def uses_model(self) -> bool:
+        """True when model calls should be attempted (not in fallback mode, breaker not open)."""
+        return not FALLBACK_MODE and self.model is not None and self.model_provider.accepting_calls()
+    
+    @property
+    def policies(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Scheme catalogue, served from the shared registry."""
+        return get_scheme_registry().policies
+    
+    def analyze_user_issue(self, user_issue: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Analyze user issue and identify relevant policies.
         
-        try:
-            prompt = f"""
-            You are a policy expert for Pakistan government schemes. Analyze this citizen's issue and identify:
-            1. What type of help they need (education, housing, healthcare, etc.)
-            2. Which specific schemes might be relevant
-            3. Key information needed to determine eligibility
-            
-            Citizen's issue: "{user_issue}"
-            
-            Available schemes: {json.dumps(self.policies, indent=2)}
-            
-            Respond in JSON format with:
-            {{
-                "issue_type": "education/housing/healthcare/general",
-                "relevant_schemes": ["scheme1", "scheme2"],
-                "required_info": ["income", "family_size", "location"],
-                "confidence": 0.8
-            }}
-            """
-            
-            response = self.model.generate_content(prompt)
-            result = json.loads(response.text)
-            return result
-        except Exception as e:
-            print(f"⚠️  AI analysis failed: {e}")
-            return self._fallback_policy_analysis(user_issue)
+        The rule-based analysis is computed first. If its confidence reaches
+        ROUTING_CONFIDENCE_THRESHOLD it is returned without asking the model;
+        otherwise the model's answer replaces it only if it arrives by the
+        deadline. The result's "source" says which.
+        """
+        fallback = self._fallback_policy_analysis(user_issue)
+        if not self.uses_model() or self._answered_by_rules(fallback):
+            return {**fallback, "source": "rules"}
+        
+        if deadline is None:
+            deadline = request_deadline()
+        result, source = hedged_call(
+            lambda: self._model_policy_analysis(user_issue), fallback, deadline, self._is_valid_analysis
+        )
+        return {**self._bounded(result), "source": source}
+    
+    async def analyze_user_issue_async(self, user_issue: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Async counterpart of analyze_user_issue."""
+        fallback = self._fallback_policy_analysis(user_issue)
+        if not self.uses_model() or self._answered_by_rules(fallback):
+            return {**fallback, "source": "rules"}
+        
+        if deadline is None:
+            deadline = request_deadline()
+        result, source = await hedged_call_async(
+            lambda: self._model_policy_analysis_async(user_issue), fallback, deadline, self._is_valid_analysis
+        )
+        return {**self._bounded(result), "source": source}
+    
+    @staticmethod
+    def _answered_by_rules(analysis: Dict[str, Any]) -> bool:
+        """Route a confident rule-based analysis away from the model, logging the decision."""
+        confidence, threshold = analysis["confidence"], ROUTING_CONFIDENCE_THRESHOLD
+        if confidence >= threshold:
+            ROUTING_STATS.record("policy", "rules")
+            print(f"🧭 Policy analysis answered by rules (confidence {confidence:.2f} >= {threshold:.2f})")
+            return True
+        ROUTING_STATS.record("policy", "llm", "low_confidence")
+        print(f"🧭 Policy analysis escalated to the model (confidence {confidence:.2f} < {threshold:.2f})")
+        return False
+    
+    @staticmethod
+    def _bounded(analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Keep at most SCHEME_RETRIEVAL_TOP_K relevant schemes, so eligibility work stays bounded."""
+        if SCHEME_RETRIEVAL_TOP_K <= 0 or len(analysis["relevant_schemes"]) <= SCHEME_RETRIEVAL_TOP_K:
+            return analysis
+        return {**analysis, "relevant_schemes": analysis["relevant_schemes"][:SCHEME_RETRIEVAL_TOP_K]}
+    
+    @staticmethod
+    def _is_valid_analysis(value: Any) -> bool:
+        return isinstance(value, dict) and isinstance(value.get("relevant_schemes"), list)
+    
+    def _model_policy_analysis(self, user_issue: str) -> Dict[str, Any]:
+        """Ask the model to analyze the issue; raises on failure."""
+        response = self.model.generate_content(self._policy_prompt(user_issue))
+        return parse_model_json(response.text)
+    
+    async def _model_policy_analysis_async(self, user_issue: str) -> Dict[str, Any]:
+        response = await generate_content_async(self.model, self._policy_prompt(user_issue))
+        return parse_model_json(response.text)
+    
+    def _policy_prompt(self, user_issue: str) -> str:
+        """Build the policy analysis prompt and record its size."""
+        prompt = f"""
+        You are a policy expert for Pakistan government schemes. Analyze this citizen's issue and identify:
+        1. What type of help they need (education, housing, healthcare, etc.)
+        2. Which specific schemes might be relevant
+        3. Key information needed to determine eligibility
+        
+        Citizen's issue: "{user_issue}"
+        
+        Available schemes: {self._catalogue_for_prompt(user_issue)}
+        
+        Respond in JSON format with:
+        {{
+            "issue_type": "education/housing/healthcare/general",
+            "relevant_schemes": ["scheme1", "scheme2"],
+            "required_info": ["income", "family_size", "location"],
+            "confidence": 0.8
+        }}
+        """
+        
+        PROMPT_STATS.record(f"policy_analysis_{POLICY_PROMPT_MODE}", prompt)
+        return prompt
+    
+    def _catalogue_for_prompt(self, user_issue: str) -> str:
+        """Return the catalogue text to embed in the policy analysis prompt."""
+        if POLICY_PROMPT_MODE == "full":
+            return json.dumps(self.policies, indent=2)
+        
+        registry = get_scheme_registry()
+        if POLICY_PROMPT_TOP_K <= 0:
+            return registry.catalogue_digest()
+        
+        scores = issue_signals(user_issue)["scores"]
+        ranked = [category for category, score in sorted(scores.items(), key=lambda item: -item[1]) if score > 0]
+        if not ranked:
+            return registry.catalogue_digest()
+        return registry.catalogue_digest(ranked[:POLICY_PROMPT_TOP_K])
     
     def _fallback_policy_analysis(self, user_issue: str) -> Dict[str, Any]:
         """Fallback analysis using rule-based approach."""
-        issue_lower = user_issue.lower()
-        
-        # More comprehensive keyword matching
-        education_keywords = ["education", "school", "student", "study", "children", "kids", "tuition", "fees", "scholarship", "learning"]
-        housing_keywords = ["house", "housing", "home", "property", "loan", "mortgage", "apartment", "residence", "accommodation"]
-        healthcare_keywords = ["health", "medical", "hospital", "treatment", "doctor", "medicine", "illness", "surgery", "card", "insurance"]
-        employment_keywords = ["job", "employment", "work", "income", "money", "cash", "salary", "business", "loan", "entrepreneur", "youth"]
-        
-        # Count keyword matches for better accuracy
-        education_score = sum(1 for keyword in education_keywords if keyword in issue_lower)
-        housing_score = sum(1 for keyword in housing_keywords if keyword in issue_lower)
-        healthcare_score = sum(1 for keyword in healthcare_keywords if keyword in issue_lower)
-        employment_score = sum(1 for keyword in employment_keywords if keyword in issue_lower)
-        
-        # Determine issue type based on highest score
-        scores = {
-            "education": education_score,
-            "housing": housing_score,
-            "healthcare": healthcare_score,
-            "employment": employment_score
-        }
+        signals = issue_signals(user_issue)
+        scores = signals["scores"]
         
-        issue_type = max(scores, key=scores.get) if max(scores.values()) > 0 else "general"
+        if self.classifier is not None:
+            issue_type, confidence = self.classifier.predict(user_issue)
+        else:
+            issue_type = max(scores, key=scores.get) if max(scores.values()) > 0 else "general"
+            # Confidence based on keyword matches
+            confidence = min(0.9, 0.5 + (max(scores.values()) * 0.1))
         
         # Get relevant schemes based on issue type
         relevant_schemes = []
@@ -257,386 +996,332 @@ class PolicyAgent:
             ]
             required_info = ["monthly_income", "family_size", "location", "specific_needs"]
         
-        # Calculate confidence based on keyword matches
-        confidence = min(0.9, 0.5 + (max(scores.values()) * 0.1))
+        # Schemes the catalogue index ranks as closest to the issue come first, then the rest of the list above
+        retrieved = get_scheme_registry().retrieve(
+            user_issue, SCHEME_RETRIEVAL_TOP_K, None if issue_type == "general" else issue_type
+        )
+        ranked = [name for name, _ in retrieved]
+        relevant_schemes = ranked + [name for name in relevant_schemes if name not in ranked]
         
-        return {
+        return self._bounded({
             "issue_type": issue_type,
             "relevant_schemes": relevant_schemes,
             "required_info": required_info,
             "confidence": confidence,
             "analysis_details": {
+                "classified_by": "classifier" if self.classifier is not None else "keywords",
                 "keyword_matches": scores,
-                "detected_needs": self._extract_specific_needs(issue_lower),
-                "urgency_level": self._assess_urgency(issue_lower)
+                "detected_needs": signals["needs"],
+                "urgency_level": signals["urgency"],
+                "scheme_scores": dict(retrieved)
             }
+        })
+
+
+class EligibilityAgent:
+    """Agent responsible for determining eligibility for government schemes."""
+    
+    def __init__(self, model_provider: ModelProvider = None):
+        self.model_provider = model_provider or get_model_provider()
+        self.model = self.model_provider.get_model()
+    
+    def uses_model(self) -> bool:
+        """True when model calls should be attempted (not in fallback mode, breaker not open)."""
+        return not FALLBACK_MODE and self.model is not None and self.model_provider.accepting_calls()
+    
+    def check_eligibility(self, scheme_name: str, user_info: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Check if user is eligible for a specific scheme.
+        
+        Like PolicyAgent.analyze_user_issue, the rule-based verdict is ready up
+        front. It is returned as is unless it reports missing or contradictory
+        data (see eligibility_escalation); then the model's verdict is used if
+        it arrives by the deadline.
+        Model verdicts are memoized, so citizens whose profiles agree on the
+        fields the scheme reads share one model call.
+        """
+        fallback = self._fallback_eligibility_check(scheme_name, user_info)
+        if not self.uses_model() or self._answered_by_rules(scheme_name, user_info):
+            return {**fallback, "source": "rules"}
+        
+        memo_key = self._memo_key(scheme_name, user_info)
+        memoized = self._memoized(memo_key)
+        if memoized is not None:
+            return {**memoized, "source": "llm"}
+        
+        if deadline is None:
+            deadline = request_deadline()
+        result, source = hedged_call(
+            lambda: self._model_eligibility_check(scheme_name, user_info), fallback, deadline, self._is_valid_verdict
+        )
+        if source == "llm":
+            self._memoize(memo_key, result)
+        return {**result, "source": source}
+    
+    async def check_eligibility_async(self, scheme_name: str, user_info: Dict[str, Any],
+                                      deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Async counterpart of check_eligibility."""
+        fallback = self._fallback_eligibility_check(scheme_name, user_info)
+        if not self.uses_model() or self._answered_by_rules(scheme_name, user_info):
+            return {**fallback, "source": "rules"}
+        
+        memo_key = self._memo_key(scheme_name, user_info)
+        memoized = self._memoized(memo_key)
+        if memoized is not None:
+            return {**memoized, "source": "llm"}
+        
+        if deadline is None:
+            deadline = request_deadline()
+        result, source = await hedged_call_async(
+            lambda: self._model_eligibility_check_async(scheme_name, user_info), fallback, deadline, self._is_valid_verdict
+        )
+        if source == "llm":
+            self._memoize(memo_key, result)
+        return {**result, "source": source}
+    
+    @staticmethod
+    def _answered_by_rules(scheme_name: str, user_info: Dict[str, Any]) -> bool:
+        """Route a decisive rule verdict away from the model, logging the decision.
+        
+        Rule verdicts count as fully confident, so a ROUTING_CONFIDENCE_THRESHOLD
+        above 1 escalates every scheme, as before routing existed.
+        """
+        reason = eligibility_escalation(scheme_name, user_info)
+        if reason is None and ROUTING_CONFIDENCE_THRESHOLD <= 1.0:
+            ROUTING_STATS.record("eligibility", "rules")
+            print(f"🧭 {scheme_name} eligibility answered by rules")
+            return True
+        reason = reason or "routing_disabled"
+        ROUTING_STATS.record("eligibility", "llm", reason)
+        print(f"🧭 {scheme_name} eligibility escalated to the model ({reason})")
+        return False
+    
+    @staticmethod
+    def _is_valid_verdict(value: Any) -> bool:
+        return isinstance(value, dict) and isinstance(value.get("eligible"), bool)
+    
+    def _memo_key(self, scheme_name: str, user_info: Dict[str, Any]) -> Optional[str]:
+        """Key a model verdict by scheme, catalogue version and the profile fields the scheme reads."""
+        if self.model_provider.verdict_memo is None:
+            return None
+        registry = get_scheme_registry()
+        rules = registry.rules_for(scheme_name)
+        if rules is None:
+            return None
+        return json.dumps([scheme_name, registry.version, rules.project(user_info)], ensure_ascii=False)
+    
+    def _memoized(self, memo_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if memo_key is None:
+            return None
+        verdict = self.model_provider.verdict_memo.get(memo_key)
+        # Callers get their own copy of the lists inside
+        return copy.deepcopy(verdict) if verdict is not None else None
+    
+    def _memoize(self, memo_key: Optional[str], verdict: Dict[str, Any]) -> None:
+        if memo_key is not None:
+            self.model_provider.verdict_memo.set(memo_key, verdict)
+    
+    @staticmethod
+    def _prompt_profile(scheme_names: List[str], user_info: Dict[str, Any]) -> Dict[str, Any]:
+        """The provided profile fields the schemes' rules read, so memoized verdicts match their key.
+        
+        Unknown schemes have no rules and get the whole user_info.
+        """
+        registry = get_scheme_registry()
+        profile = {}
+        for scheme_name in scheme_names:
+            rules = registry.rules_for(scheme_name)
+            if rules is None:
+                return user_info
+            profile.update(rules.project(user_info))
+        return {
+            field: int(value) if value.is_integer() else value
+            for field, value in sorted(profile.items(), key=lambda item: PROFILE_FIELDS.index(item[0]))
+            if value > 0
         }
     
-    def _extract_specific_needs(self, issue_lower: str) -> List[str]:
-        """Extract specific needs from the user issue."""
-        needs = []
+    def _model_eligibility_check(self, scheme_name: str, user_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Ask the model whether the user is eligible; raises on failure."""
+        response = self.model.generate_content(self._eligibility_prompt(scheme_name, user_info))
+        return parse_model_json(response.text)
+    
+    async def _model_eligibility_check_async(self, scheme_name: str, user_info: Dict[str, Any]) -> Dict[str, Any]:
+        response = await generate_content_async(self.model, self._eligibility_prompt(scheme_name, user_info))
+        return parse_model_json(response.text)
+    
+    def _eligibility_prompt(self, scheme_name: str, user_info: Dict[str, Any]) -> str:
+        """Build the single-scheme eligibility prompt and record its size."""
+        prompt = f"""
+        You are an eligibility expert for Pakistan government schemes. Determine if this citizen is eligible:
         
-        if any(word in issue_lower for word in ["urgent", "emergency", "immediate", "asap"]):
-            needs.append("urgent_assistance")
+        Scheme: {scheme_name}
+        Policy catalogue version: {get_scheme_registry().version}
+        User Information: {json.dumps(self._prompt_profile([scheme_name], user_info), indent=2)}
         
-        if any(word in issue_lower for word in ["financial", "money", "cash", "income"]):
-            needs.append("financial_support")
+        Respond in JSON format:
+        {{
+            "eligible": true/false,
+            "reason": "explanation of eligibility decision",
+            "missing_requirements": ["requirement1", "requirement2"],
+            "next_steps": ["step1", "step2"]
+        }}
+        """
         
-        if any(word in issue_lower for word in ["family", "children", "kids"]):
-            needs.append("family_support")
+        PROMPT_STATS.record("eligibility", prompt)
+        return prompt
+    
+    def check_eligibility_many(self, scheme_names: List[str], user_info: Dict[str, Any],
+                               deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Check several schemes with a single model call, in the order given.
         
-        if any(word in issue_lower for word in ["medical", "health", "treatment"]):
-            needs.append("healthcare_support")
+        Schemes the rules settle and schemes with a memoized verdict are left
+        out of the call. Schemes the model leaves out or answers malformed, or
+        all of them if the call misses the deadline, get the rule-based verdict.
+        """
+        fallbacks = [self._fallback_eligibility_check(name, user_info) for name in scheme_names]
+        if not self.uses_model() or not scheme_names:
+            return [{**fallback, "source": "rules"} for fallback in fallbacks]
         
-        if any(word in issue_lower for word in ["education", "school", "study"]):
-            needs.append("education_support")
+        escalated = [name for name in scheme_names if not self._answered_by_rules(name, user_info)]
+        memo_keys = {name: self._memo_key(name, user_info) for name in escalated}
+        verdicts = {}
+        for name, memo_key in memo_keys.items():
+            memoized = self._memoized(memo_key)
+            if memoized is not None:
+                verdicts[name] = memoized
+        missing = [name for name in escalated if name not in verdicts]
+        if not missing:
+            return self._merge_verdicts(scheme_names, verdicts, fallbacks)
         
-        return needs if needs else ["general_assistance"]
+        if deadline is None:
+            deadline = request_deadline()
+        answered, _ = hedged_call(
+            lambda: self._model_eligibility_many(missing, user_info),
+            {},
+            deadline,
+            lambda value: isinstance(value, dict)
+        )
+        for name, verdict in answered.items():
+            self._memoize(memo_keys[name], verdict)
+        verdicts.update(answered)
+        return self._merge_verdicts(scheme_names, verdicts, fallbacks)
     
-    def _assess_urgency(self, issue_lower: str) -> str:
-        """Assess the urgency level of the issue."""
-        urgent_keywords = ["urgent", "emergency", "immediate", "asap", "critical", "desperate"]
-        moderate_keywords = ["soon", "quickly", "fast", "priority"]
+    async def check_eligibility_many_async(self, scheme_names: List[str], user_info: Dict[str, Any],
+                                           deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Async counterpart of check_eligibility_many."""
+        fallbacks = [self._fallback_eligibility_check(name, user_info) for name in scheme_names]
+        if not self.uses_model() or not scheme_names:
+            return [{**fallback, "source": "rules"} for fallback in fallbacks]
         
-        if any(keyword in issue_lower for keyword in urgent_keywords):
-            return "high"
-        elif any(keyword in issue_lower for keyword in moderate_keywords):
-            return "medium"
-        else:
-            return "low"
-
-
-class EligibilityAgent:
-    """Agent responsible for determining eligibility for government schemes."""
+        escalated = [name for name in scheme_names if not self._answered_by_rules(name, user_info)]
+        memo_keys = {name: self._memo_key(name, user_info) for name in escalated}
+        verdicts = {}
+        for name, memo_key in memo_keys.items():
+            memoized = self._memoized(memo_key)
+            if memoized is not None:
+                verdicts[name] = memoized
+        missing = [name for name in escalated if name not in verdicts]
+        if not missing:
+            return self._merge_verdicts(scheme_names, verdicts, fallbacks)
+        
+        if deadline is None:
+            deadline = request_deadline()
+        answered, _ = await hedged_call_async(
+            lambda: self._model_eligibility_many_async(missing, user_info),
+            {},
+            deadline,
+            lambda value: isinstance(value, dict)
+        )
+        for name, verdict in answered.items():
+            self._memoize(memo_keys[name], verdict)
+        verdicts.update(answered)
+        return self._merge_verdicts(scheme_names, verdicts, fallbacks)
     
-    def __init__(self):
-        if not FALLBACK_MODE and VERTEXAI_AVAILABLE and GenerativeModel:
-            try:
-                self.model = GenerativeModel("gemini-pro")
-            except Exception as e:
-                print(f"⚠️  Warning: Could not initialize Gemini model: {e}")
-                self.model = None
-        else:
-            self.model = None
+    @staticmethod
+    def _merge_verdicts(scheme_names: List[str], verdicts: Dict[str, Dict[str, Any]],
+                        fallbacks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [
+            {**verdicts[name], "source": "llm"} if name in verdicts else {**fallback, "source": "rules"}
+            for name, fallback in zip(scheme_names, fallbacks)
+        ]
+    
+    def _model_eligibility_many(self, scheme_names: List[str], user_info: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Ask the model about several schemes at once; returns the well-formed verdicts by scheme."""
+        response = self.model.generate_content(self._eligibility_many_prompt(scheme_names, user_info))
+        return self._parse_verdicts(response.text, scheme_names)
     
-    def check_eligibility(self, scheme_name: str, user_info: Dict[str, Any]) -> Dict[str, Any]:
-        """Check if user is eligible for a specific scheme."""
-        if FALLBACK_MODE or self.model is None:
-            return self._fallback_eligibility_check(scheme_name, user_info)
+    async def _model_eligibility_many_async(self, scheme_names: List[str], user_info: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        response = await generate_content_async(self.model, self._eligibility_many_prompt(scheme_names, user_info))
+        return self._parse_verdicts(response.text, scheme_names)
+    
+    def _eligibility_many_prompt(self, scheme_names: List[str], user_info: Dict[str, Any]) -> str:
+        """Build the multi-scheme eligibility prompt and record its size."""
+        prompt = f"""
+        You are an eligibility expert for Pakistan government schemes. Determine if this citizen is eligible for each scheme:
         
-        try:
-            prompt = f"""
-            You are an eligibility expert for Pakistan government schemes. Determine if this citizen is eligible:
-            
-            Scheme: {scheme_name}
-            User Information: {json.dumps(user_info, indent=2)}
-            
-            Respond in JSON format:
+        Schemes: {json.dumps(scheme_names)}
+        Policy catalogue version: {get_scheme_registry().version}
+        User Information: {json.dumps(self._prompt_profile(scheme_names, user_info), indent=2)}
+        
+        Respond with a JSON array containing one object per scheme:
+        [
             {{
+                "scheme": "exact scheme name",
                 "eligible": true/false,
                 "reason": "explanation of eligibility decision",
                 "missing_requirements": ["requirement1", "requirement2"],
                 "next_steps": ["step1", "step2"]
             }}
-            """
-            
-            response = self.model.generate_content(prompt)
-            result = json.loads(response.text)
-            return result
-        except Exception as e:
-            print(f"⚠️  AI eligibility check failed: {e}")
-            return self._fallback_eligibility_check(scheme_name, user_info)
+        ]
+        """
+        
+        PROMPT_STATS.record("eligibility_batch", prompt)
+        return prompt
     
-    def _fallback_eligibility_check(self, scheme_name: str, user_info: Dict[str, Any]) -> Dict[str, Any]:
-        """Fallback eligibility check using rule-based approach."""
-        monthly_income = user_info.get("monthly_income", 0)
-        family_size = user_info.get("family_size", 0)
-        number_of_children = user_info.get("number_of_children", 0)
+    @staticmethod
+    def _parse_verdicts(text: str, scheme_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Keep the well-formed verdicts of a multi-scheme answer, by scheme."""
+        verdicts = {}
+        for item in parse_model_json(text):
+            if isinstance(item, dict) and isinstance(item.get("eligible"), bool) and item.get("scheme") in scheme_names:
+                verdicts.setdefault(item["scheme"], {
+                    "eligible": item["eligible"],
+                    "reason": str(item.get("reason", "")),
+                    "missing_requirements": list(item.get("missing_requirements") or []),
+                    "next_steps": list(item.get("next_steps") or [])
+                })
+        return verdicts
+    
+    def check_eligibility_batch(self, columns: Dict[str, Any], scheme_names: List[str] = None) -> Dict[str, Any]:
+        """Check many citizens against many schemes with the rule engine in one vectorized pass.
         
-        # Get scheme details from PolicyAgent
-        policy_agent = PolicyAgent()
-        scheme_details = self._find_scheme_details(scheme_name, policy_agent.policies)
+        ``columns`` maps monthly_income, number_of_children, family_size and age
+        to equal-length arrays. The result holds an (N, M) boolean ``eligible``
+        matrix and matching ``reason_codes`` (see eligibility_rules.REASON_NAMES).
+        """
+        thresholds = get_scheme_registry().thresholds(scheme_names)
+        eligible, reason_codes = thresholds.evaluate(columns)
+        return {
+            "schemes": list(thresholds.scheme_names),
+            "eligible": eligible,
+            "reason_codes": reason_codes
+        }
+    
+    def _fallback_eligibility_check(self, scheme_name: str, user_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Fallback eligibility check using the compiled scheme rules."""
+        rules = get_scheme_registry().rules_for(scheme_name)
         
-        if not scheme_details:
-                return {
+        if rules is None:
+            return {
                 "eligible": False,
                 "reason": "Scheme not found in our database",
                 "missing_requirements": ["Valid scheme name required"],
                 "next_steps": ["Contact helpline for assistance", "Check official government websites"]
             }
         
-        # Check eligibility based on scheme type and criteria
-        eligible = True
-        missing_requirements = []
-        reasons = []
-        
-        # Education schemes
-        if "Education" in scheme_name or "Ehsaas Education Grant" in scheme_name:
-            # Check income first
-            if monthly_income > 0 and monthly_income > 30000:
-                eligible = False
-                missing_requirements.append(f"Income exceeds limit (your income: PKR {monthly_income:,}, max allowed: PKR 30,000)")
-                reasons.append("Monthly income is too high for this scheme")
-            elif monthly_income > 0 and monthly_income <= 30000:
-                reasons.append(f"✅ Income is within limit (PKR {monthly_income:,} ≤ PKR 30,000)")
-            
-            # Check children requirement
-            if number_of_children > 0 and number_of_children < 2:
-                eligible = False
-                missing_requirements.append(f"Need at least 2 school-aged children (you have: {number_of_children})")
-                reasons.append("Family size requirement not met")
-            elif number_of_children >= 2:
-                reasons.append(f"✅ Family size requirement met ({number_of_children} children ≥ 2 required)")
-            
-            # If we have both income and children info, determine eligibility
-            if monthly_income > 0 and number_of_children > 0:
-                if monthly_income <= 30000 and number_of_children >= 2:
-                    reasons.append("🎉 You are eligible for this education scheme!")
-                    eligible = True
-                else:
-                    eligible = False
-            elif monthly_income > 0 and number_of_children == 0:
-                # Only income provided, be more lenient
-                if monthly_income <= 30000:
-                    reasons.append("✅ Income requirement met, but need at least 2 children")
-                    eligible = False
-                    missing_requirements.append("Need at least 2 school-aged children")
-                else:
-                    eligible = False
-            elif monthly_income == 0 and number_of_children > 0:
-                # Only children provided, be more lenient
-                if number_of_children >= 2:
-                    reasons.append("✅ Family size requirement met, but need income information")
-                    eligible = False
-                    missing_requirements.append("Income information required")
-                else:
-                    eligible = False
-            else:
-                # No specific info provided, be helpful
-                reasons.append("ℹ️ Please provide income and family size for accurate assessment")
-                eligible = False
-                missing_requirements.append("Income and family size information required")
-        
-        elif "Prime Minister's Education Initiative" in scheme_name:
-            # Check income first
-            if monthly_income > 0 and monthly_income > 40000:
-                eligible = False
-                missing_requirements.append(f"Income exceeds limit (your income: PKR {monthly_income:,}, max allowed: PKR 40,000)")
-                reasons.append("Monthly income is too high for this scheme")
-            elif monthly_income > 0 and monthly_income <= 40000:
-                reasons.append(f"✅ Income is within limit (PKR {monthly_income:,} ≤ PKR 40,000)")
-            
-            # Check children requirement
-            if number_of_children > 0 and number_of_children < 1:
-                eligible = False
-                missing_requirements.append(f"Need at least 1 school-aged child (you have: {number_of_children})")
-                reasons.append("Family size requirement not met")
-            elif number_of_children >= 1:
-                reasons.append(f"✅ Family size requirement met ({number_of_children} children ≥ 1 required)")
-            
-            # If we have both income and children info, determine eligibility
-            if monthly_income > 0 and number_of_children > 0:
-                if monthly_income <= 40000 and number_of_children >= 1:
-                    reasons.append("🎉 You are eligible for this education initiative!")
-                    eligible = True
-                else:
-                    eligible = False
-            elif monthly_income > 0 and number_of_children == 0:
-                # Only income provided, be more lenient
-                if monthly_income <= 40000:
-                    reasons.append("✅ Income requirement met, but need at least 1 child")
-                    eligible = False
-                    missing_requirements.append("Need at least 1 school-aged child")
-                else:
-                    eligible = False
-            elif monthly_income == 0 and number_of_children > 0:
-                # Only children provided, be more lenient
-                if number_of_children >= 1:
-                    reasons.append("✅ Family size requirement met, but need income information")
-                    eligible = False
-                    missing_requirements.append("Income information required")
-                else:
-                    eligible = False
-            else:
-                # No specific info provided, be helpful
-                reasons.append("ℹ️ Please provide income and family size for accurate assessment")
-                eligible = False
-                missing_requirements.append("Income and family size information required")
-        
-        elif "BISP" in scheme_name or "Benazir Income Support Programme" in scheme_name:
-            # Check income first
-            if monthly_income > 0 and monthly_income > 25000:
-                eligible = False
-                missing_requirements.append(f"Income exceeds limit (your income: PKR {monthly_income:,}, max allowed: PKR 25,000)")
-                reasons.append("Monthly income is too high for this scheme")
-            elif monthly_income > 0 and monthly_income <= 25000:
-                reasons.append(f"✅ Income is within limit (PKR {monthly_income:,} ≤ PKR 25,000)")
-            
-            # Check family size requirement
-            if family_size > 0 and family_size < 2:
-                eligible = False
-                missing_requirements.append(f"Need at least 2 family members (you have: {family_size})")
-                reasons.append("Family size requirement not met")
-            elif family_size >= 2:
-                reasons.append(f"✅ Family size requirement met ({family_size} family members ≥ 2 required)")
-            
-            # If we have both income and family info, determine eligibility
-            if monthly_income > 0 and family_size > 0:
-                if monthly_income <= 25000 and family_size >= 2:
-                    reasons.append("🎉 You are eligible for BISP support!")
-                    eligible = True
-                else:
-                    eligible = False
-            elif monthly_income > 0 and family_size == 0:
-                # Only income provided, be more lenient
-                if monthly_income <= 25000:
-                    reasons.append("✅ Income requirement met, but need at least 2 family members")
-                    eligible = False
-                    missing_requirements.append("Need at least 2 family members")
-                else:
-                    eligible = False
-            elif monthly_income == 0 and family_size > 0:
-                # Only family size provided, be more lenient
-                if family_size >= 2:
-                    reasons.append("✅ Family size requirement met, but need income information")
-                    eligible = False
-                    missing_requirements.append("Income information required")
-                else:
-                    eligible = False
-            else:
-                # No specific info provided, be helpful
-                reasons.append("ℹ️ Please provide income and family size for accurate assessment")
-                eligible = False
-                missing_requirements.append("Income and family size information required")
-        
-        # Housing schemes
-        elif "Housing" in scheme_name or "Naya Pakistan Housing" in scheme_name:
-            # Check income range
-            if monthly_income > 0 and monthly_income < 25000:
-                eligible = False
-                missing_requirements.append(f"Income too low (your income: PKR {monthly_income:,}, minimum required: PKR 25,000)")
-                reasons.append("Income too low for housing loan")
-            elif monthly_income > 0 and monthly_income > 60000:
-                eligible = False
-                missing_requirements.append(f"Income exceeds limit (your income: PKR {monthly_income:,}, max allowed: PKR 60,000)")
-                reasons.append("Income too high for this scheme")
-            elif monthly_income > 0:
-                reasons.append(f"✅ Income is within range (PKR {monthly_income:,} is between PKR 25,000 - PKR 60,000)")
-                eligible = True
-            
-            if eligible and monthly_income > 0:
-                reasons.append("🎉 You are eligible for housing loan!")
-            elif monthly_income == 0:
-                reasons.append("ℹ️ Please provide income information for accurate assessment")
-                eligible = False
-                missing_requirements.append("Income information required")
-        
-        elif "Apna Ghar" in scheme_name:
-            # Check income range
-            if monthly_income > 0 and monthly_income < 20000:
-                eligible = False
-                missing_requirements.append(f"Income too low (your income: PKR {monthly_income:,}, minimum required: PKR 20,000)")
-                reasons.append("Income too low for this scheme")
-            elif monthly_income > 0 and monthly_income > 50000:
-                eligible = False
-                missing_requirements.append(f"Income exceeds limit (your income: PKR {monthly_income:,}, max allowed: PKR 50,000)")
-                reasons.append("Income too high for this scheme")
-            elif monthly_income > 0:
-                reasons.append(f"✅ Income is within range (PKR {monthly_income:,} is between PKR 20,000 - PKR 50,000)")
-                eligible = True
-            
-            if eligible and monthly_income > 0:
-                reasons.append("🎉 You are eligible for Apna Ghar scheme!")
-            elif monthly_income == 0:
-                reasons.append("ℹ️ Please provide income information for accurate assessment")
-                eligible = False
-                missing_requirements.append("Income information required")
-        
-        # Healthcare schemes
-        elif "Sehat Card" in scheme_name:
-            # Check income limit
-            if monthly_income > 0 and monthly_income > 50000:
-                eligible = False
-                missing_requirements.append(f"Income exceeds limit (your income: PKR {monthly_income:,}, max allowed: PKR 50,000)")
-                reasons.append("Income too high for free healthcare")
-            elif monthly_income > 0:
-                reasons.append(f"✅ Income is within limit (PKR {monthly_income:,} ≤ PKR 50,000)")
-                eligible = True
-            
-            if eligible and monthly_income > 0:
-                reasons.append("🎉 You are eligible for Sehat Card!")
-            elif monthly_income == 0:
-                reasons.append("ℹ️ Please provide income information for accurate assessment")
-                eligible = False
-                missing_requirements.append("Income information required")
-        
-        elif "Ehsaas Health Insurance" in scheme_name:
-            # Check income limit
-            if monthly_income > 0 and monthly_income > 30000:
-                eligible = False
-                missing_requirements.append(f"Income exceeds limit (your income: PKR {monthly_income:,}, max allowed: PKR 30,000)")
-                reasons.append("Income too high for health insurance")
-            elif monthly_income > 0:
-                reasons.append(f"✅ Income is within limit (PKR {monthly_income:,} ≤ PKR 30,000)")
-                eligible = True
-            
-            if eligible and monthly_income > 0:
-                reasons.append("🎉 You are eligible for Ehsaas Health Insurance!")
-            elif monthly_income == 0:
-                reasons.append("ℹ️ Please provide income information for accurate assessment")
-                eligible = False
-                missing_requirements.append("Income information required")
-        
-        # Employment schemes
-        elif "Emergency Cash" in scheme_name:
-            # Check income limit
-            if monthly_income > 0 and monthly_income > 20000:
-                eligible = False
-                missing_requirements.append(f"Income exceeds limit (your income: PKR {monthly_income:,}, max allowed: PKR 20,000)")
-                reasons.append("Income too high for emergency assistance")
-            elif monthly_income > 0:
-                reasons.append(f"✅ Income is within limit (PKR {monthly_income:,} ≤ PKR 20,000)")
-                eligible = True
-            
-            if eligible and monthly_income > 0:
-                reasons.append("🎉 You are eligible for Emergency Cash assistance!")
-            elif monthly_income == 0:
-                reasons.append("ℹ️ Please provide income information for accurate assessment")
-                eligible = False
-                missing_requirements.append("Income information required")
-        
-        elif "Kamyab Jawan" in scheme_name:
-            age = user_info.get("age", 0)
-            # Check age requirement
-            if age > 0 and age > 35:
-                eligible = False
-                missing_requirements.append(f"Age exceeds limit (your age: {age} years, max allowed: 35 years)")
-                reasons.append("Age requirement not met")
-            elif age > 0 and age < 18:
-                eligible = False
-                missing_requirements.append(f"Minimum age required (your age: {age} years, minimum required: 18 years)")
-                reasons.append("Age requirement not met")
-            elif age > 0:
-                reasons.append(f"✅ Age requirement met ({age} years is between 18-35)")
-                eligible = True
-            
-            if eligible and age > 0:
-                reasons.append("🎉 You are eligible for Kamyab Jawan program!")
-            elif age == 0:
-                reasons.append("ℹ️ Please provide age information for accurate assessment")
-                eligible = False
-                missing_requirements.append("Age information required")
-        
-        # Default case - be more helpful and lenient
-        else:
-            if monthly_income == 0:
-                missing_requirements.append("Income information required for accurate assessment")
-                reasons.append("Need income information to determine eligibility")
-                eligible = False
-            else:
-                reasons.append(f"✅ Basic eligibility criteria appear to be met (income: PKR {monthly_income:,})")
-                eligible = True
-                reasons.append("ℹ️ This scheme may be suitable for you. Contact helpline for detailed assessment.")
+        verdict = rules.evaluate(user_info)
+        eligible = verdict.eligible
+        reasons = verdict.reasons
+        missing_requirements = verdict.missing_requirements
         
         # Generate next steps
         next_steps = []
@@ -661,28 +1346,14 @@ class EligibilityAgent:
             "missing_requirements": missing_requirements,
             "next_steps": next_steps
         }
-    
-    def _find_scheme_details(self, scheme_name: str, policies: Dict) -> Dict:
-        """Find scheme details from policies."""
-        for category, schemes in policies.items():
-            for scheme in schemes:
-                if scheme["name"] == scheme_name:
-                    return scheme
-        return None
 
 
 class ExplanationAgent:
     """Agent responsible for explaining complex information in simple terms."""
     
-    def __init__(self):
-        if not FALLBACK_MODE and VERTEXAI_AVAILABLE and GenerativeModel:
-            try:
-                self.model = GenerativeModel("gemini-pro")
-            except Exception as e:
-                print(f"⚠️  Warning: Could not initialize Gemini model: {e}")
-                self.model = None
-        else:
-            self.model = None
+    def __init__(self, model_provider: ModelProvider = None):
+        self.model_provider = model_provider or get_model_provider()
+        self.model = self.model_provider.get_model()
     
     def explain_in_plain_language(self, analysis_data: Dict[str, Any]) -> str:
         """Convert analysis data to simple, citizen-friendly language."""
@@ -940,22 +1611,14 @@ class ExplanationAgent:
 class DocumentCollectionAgent:
     """Agent responsible for collecting required documents from users."""
     
-    def __init__(self):
-        if not FALLBACK_MODE and VERTEXAI_AVAILABLE and GenerativeModel:
-            try:
-                self.model = GenerativeModel("gemini-pro")
-            except Exception as e:
-                print(f"⚠️  Warning: Could not initialize Gemini model: {e}")
-                self.model = None
-        else:
-            self.model = None
+    def __init__(self, model_provider: ModelProvider = None):
+        self.model_provider = model_provider or get_model_provider()
+        self.model = self.model_provider.get_model()
     
     def collect_documents(self, scheme_name: str, user_info: Dict[str, Any]) -> Dict[str, Any]:
         """Collect required documents for a specific scheme."""
         try:
-            # Get scheme details from PolicyAgent
-            policy_agent = PolicyAgent()
-            scheme_details = self._find_scheme_details(scheme_name, policy_agent.policies)
+            scheme_details = get_scheme_registry().get(scheme_name)
             
             if not scheme_details:
                 return {
@@ -992,14 +1655,6 @@ class DocumentCollectionAgent:
                 "document_status": {}
             }
     
-    def _find_scheme_details(self, scheme_name: str, policies: Dict) -> Dict:
-        """Find scheme details from policies."""
-        for category, schemes in policies.items():
-            for scheme in schemes:
-                if scheme["name"] == scheme_name:
-                    return scheme
-        return None
-    
     def update_document_status(self, scheme_name: str, document_name: str, status: str) -> Dict[str, Any]:
         """Update the status of a specific document."""
         return {
@@ -1013,15 +1668,9 @@ class DocumentCollectionAgent:
 class HelplineAgent:
     """Agent responsible for providing helpline information and forwarding queries."""
     
-    def __init__(self):
-        if not FALLBACK_MODE and VERTEXAI_AVAILABLE and GenerativeModel:
-            try:
-                self.model = GenerativeModel("gemini-pro")
-            except Exception as e:
-                print(f"⚠️  Warning: Could not initialize Gemini model: {e}")
-                self.model = None
-        else:
-            self.model = None
+    def __init__(self, model_provider: ModelProvider = None):
+        self.model_provider = model_provider or get_model_provider()
+        self.model = self.model_provider.get_model()
         
         self.general_helplines = {
             "citizen_portal": "0800-12345",
@@ -1037,8 +1686,7 @@ class HelplineAgent:
             
             if scheme_name:
                 # Get scheme-specific helpline
-                policy_agent = PolicyAgent()
-                scheme_details = self._find_scheme_details(scheme_name, policy_agent.policies)
+                scheme_details = get_scheme_registry().get(scheme_name)
                 if scheme_details and "helpline" in scheme_details:
                     helplines.append({
                         "name": scheme_name,
@@ -1118,48 +1766,28 @@ class HelplineAgent:
                 "reference_number": None
             }
     
-    def _find_scheme_details(self, scheme_name: str, policies: Dict) -> Dict:
-        """Find scheme details from policies."""
-        for category, schemes in policies.items():
-            for scheme in schemes:
-                if scheme["name"] == scheme_name:
-                    return scheme
-        return None
-    
     def _determine_department(self, user_issue: str) -> str:
         """Determine relevant department based on user issue."""
-        issue_lower = user_issue.lower()
-        
-        if any(word in issue_lower for word in ["education", "school", "student", "study"]):
-            return "Education Department"
-        elif any(word in issue_lower for word in ["health", "medical", "hospital", "treatment"]):
-            return "Health Department"
-        elif any(word in issue_lower for word in ["house", "housing", "home", "property"]):
-            return "Housing Department"
-        elif any(word in issue_lower for word in ["job", "employment", "work", "income"]):
-            return "Labor Department"
-        else:
-            return "General Services Department"
+        return issue_signals(user_issue)["department"]
 
 
 class ApplicationAssistantAgent:
     """Agent responsible for helping users apply for schemes."""
     
-    def __init__(self):
-        if not FALLBACK_MODE and VERTEXAI_AVAILABLE and GenerativeModel:
-            try:
-                self.model = GenerativeModel("gemini-pro")
-            except Exception as e:
-                print(f"⚠️  Warning: Could not initialize Gemini model: {e}")
-                self.model = None
-        else:
-            self.model = None
+    def __init__(self, model_provider: ModelProvider = None, eligibility_agent: EligibilityAgent = None):
+        self.model_provider = model_provider or get_model_provider()
+        self.model = self.model_provider.get_model()
+        self.eligibility_agent = eligibility_agent or EligibilityAgent(model_provider)
     
-    def assist_application(self, scheme_name: str, user_info: Dict[str, Any], documents: Dict[str, str] = None) -> Dict[str, Any]:
-        """Assist user with scheme application process."""
+    def assist_application(self, scheme_name: str, user_info: Dict[str, Any], documents: Dict[str, str] = None,
+                           eligibility_result: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Assist user with scheme application process.
+        
+        eligibility_result, a verdict already computed for this user_info (for
+        example kept in the session), skips the eligibility check.
+        """
         try:
-            policy_agent = PolicyAgent()
-            scheme_details = self._find_scheme_details(scheme_name, policy_agent.policies)
+            scheme_details = get_scheme_registry().get(scheme_name)
             
             if not scheme_details:
                 return {
@@ -1169,8 +1797,8 @@ class ApplicationAssistantAgent:
                 }
             
             # Check eligibility first
-            eligibility_agent = EligibilityAgent()
-            eligibility_result = eligibility_agent.check_eligibility(scheme_name, user_info)
+            if eligibility_result is None:
+                eligibility_result = self.eligibility_agent.check_eligibility(scheme_name, user_info)
             
             if not eligibility_result.get("eligible", False):
                 return {
@@ -1201,14 +1829,6 @@ class ApplicationAssistantAgent:
                 "application_steps": []
             }
     
-    def _find_scheme_details(self, scheme_name: str, policies: Dict) -> Dict:
-        """Find scheme details from policies."""
-        for category, schemes in policies.items():
-            for scheme in schemes:
-                if scheme["name"] == scheme_name:
-                    return scheme
-        return None
-    
     def _generate_application_steps(self, scheme_details: Dict, user_info: Dict, documents: Dict) -> List[str]:
         """Generate step-by-step application process."""
         steps = []
@@ -1247,94 +1867,454 @@ class ApplicationAssistantAgent:
 class AgentOrchestrator:
     """Orchestrates multiple agents to solve user issues."""
     
-    def __init__(self):
-        self.policy_agent = PolicyAgent()
-        self.eligibility_agent = EligibilityAgent()
-        self.explanation_agent = ExplanationAgent()
-        self.document_agent = DocumentCollectionAgent()
-        self.helpline_agent = HelplineAgent()
-        self.application_agent = ApplicationAssistantAgent()
-    
-    def solve_user_issue(self, user_issue: str, user_info: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Main method to solve user issues using multiple agents."""
+    def __init__(self, model_provider: ModelProvider = None, max_concurrency: int = None):
+        model_provider = model_provider or get_model_provider()
+        self.max_concurrency = max_concurrency or ELIGIBILITY_CONCURRENCY
+        self.eligibility_mode = ELIGIBILITY_MODE
+        self.llm_deadline = LLM_DEADLINE_SECONDS
+        self.single_flight = SingleFlight() if REQUEST_COALESCING else None
+        self.async_single_flight = AsyncSingleFlight() if REQUEST_COALESCING else None
+        self.extra_stages = []
+        self.policy_agent = PolicyAgent(model_provider)
+        self.eligibility_agent = EligibilityAgent(model_provider)
+        self.explanation_agent = ExplanationAgent(model_provider)
+        self.document_agent = DocumentCollectionAgent(model_provider)
+        self.helpline_agent = HelplineAgent(model_provider)
+        self.application_agent = ApplicationAssistantAgent(model_provider, self.eligibility_agent)
+    
+    def solve_user_issue(self, user_issue: str, user_info: Dict[str, Any] = None,
+                         on_stage: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Main method to solve user issues using multiple agents.
+        
+        Identical submissions arriving while one is being solved wait for it
+        and receive a copy of its response. If on_stage is given, it is called
+        with each stage's name and a copy of the response built so far as the
+        stage finishes; such calls are never coalesced, since a joined caller
+        would not see the stages.
+        """
+        if user_info is None:
+            user_info = {}
+        if on_stage is not None:
+            response = {"status": "success"}
+            for name, data in self._run_stages(user_issue, user_info):
+                response.update(data)
+                on_stage(name, copy.deepcopy(response))
+            return response
+        if self.single_flight is None:
+            return self._assemble_response(self.stream_user_issue(user_issue, user_info))
+        response, _ = self.single_flight.do(
+            coalescing_key(user_issue, user_info),
+            lambda: self._assemble_response(self.stream_user_issue(user_issue, user_info))
+        )
+        return response
+    
+    async def solve_user_issue_async(self, user_issue: str, user_info: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Async counterpart of solve_user_issue, for serving from an event loop (see asgi_app.py)."""
+        if user_info is None:
+            user_info = {}
+        if self.async_single_flight is None:
+            return await self._solve_user_issue_async(user_issue, user_info)
+        response, _ = await self.async_single_flight.do(
+            coalescing_key(user_issue, user_info),
+            lambda: self._solve_user_issue_async(user_issue, user_info)
+        )
+        return response
+    
+    def reevaluate(self, user_issue: str, user_info: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Solve a corrected submission, reusing the parts of the previous analysis the correction cannot change.
+        
+        ``previous`` is the session's stored analysis (see
+        SessionStore.save_analysis), i.e. one this server computed; it must
+        never come from the client. With the same issue text, its policy
+        analysis and helpline info are kept and only schemes whose verdict
+        depends on a changed field are checked again: rule verdicts when a
+        field their rules read changed, model verdicts when any user_info
+        field changed. Otherwise, or when extra stages are plugged in, this
+        is solve_user_issue.
+        """
+        user_info = user_info or {}
+        if (self.extra_stages or not self._is_reusable(previous)
+                or normalize_issue(user_issue) != normalize_issue(previous["issue"])):
+            return self.solve_user_issue(user_issue, user_info)
+        
+        previous_user_info = previous["user_info"] or {}
+        policy_analysis = previous["issue_analysis"]
+        relevant_schemes = policy_analysis.get("relevant_schemes", [])
+        previous_verdicts = dict(previous["eligibility"])
+        stale = [
+            scheme for scheme in relevant_schemes
+            if verdict_needs_recheck(scheme, previous_verdicts.get(scheme), previous_user_info, user_info)
+        ]
+        
+        deadline = request_deadline(self.llm_deadline)
+        uses_model = self.eligibility_agent.uses_model()
+        if self.eligibility_mode == "batched" and uses_model:
+            verdicts = self.eligibility_agent.check_eligibility_many(stale, user_info, deadline) if stale else []
+        else:
+            verdicts = run_bounded(
+                lambda scheme: self.eligibility_agent.check_eligibility(scheme, user_info, deadline),
+                stale, self.max_concurrency if uses_model else 1
+            )
+        previous_verdicts.update(zip(stale, verdicts))
+        
+        eligibility = self._eligibility_payload(relevant_schemes, [
+            self._complete_scheme(scheme, previous_verdicts[scheme], user_info) for scheme in relevant_schemes
+        ])
+        return {
+            "status": "success",
+            "issue_analysis": policy_analysis,
+            **eligibility,
+            "helpline_info": previous["helpline_info"],
+            "explanation": self.explanation_agent.explain_in_plain_language({
+                "issue_analysis": policy_analysis,
+                "eligibility_results": eligibility["eligibility_results"],
+                "user_info": user_info
+            }),
+            **self._complete_stage(eligibility)
+        }
+    
+    @staticmethod
+    def _is_reusable(previous: Any) -> bool:
+        return (
+            isinstance(previous, dict) and isinstance(previous.get("issue"), str)
+            and isinstance(previous.get("issue_analysis"), dict)
+            and isinstance(previous.get("eligibility"), dict)
+            and "helpline_info" in previous
+        )
+    
+    def coalescing_stats(self) -> Dict[str, Any]:
+        """Return single-flight counters."""
+        if self.single_flight is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.single_flight.stats(), "async": self.async_single_flight.stats()}
+    
+    def solve_many(self, records: Iterable[Any],
+                   max_concurrency: int = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Solve a stream of {"issue", "user_info"} records, yielding (index, response) as each finishes.
+        
+        At most max_concurrency records are in flight and records are read
+        only as slots free up, so memory does not grow with the batch. A
+        record identical to one of the last BATCH_DEDUPE_WINDOW records
+        reuses its response instead of being solved again. Invalid records
+        get an error response.
+        """
+        max_concurrency = max_concurrency or BATCH_CONCURRENCY
+        executor = get_batch_executor()
+        pending = {}  # future -> indices of the records waiting on it
+        recent = OrderedDict()  # coalescing key -> future
+        records = enumerate(records)
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_concurrency:
+                item = next(records, None)
+                if item is None:
+                    exhausted = True
+                    break
+                index, record = item
+                problem = self._batch_record_problem(record)
+                if problem:
+                    yield index, {"status": "error", "message": problem}
+                    continue
+                
+                user_issue, user_info = record["issue"], record.get("user_info") or {}
+                key = coalescing_key(user_issue, user_info)
+                future = recent.get(key)
+                if future is not None:
+                    recent.move_to_end(key)
+                    if future in pending:
+                        pending[future].append(index)
+                    else:
+                        yield index, copy.deepcopy(self._batch_response(future))
+                    continue
+                
+                future = executor.submit(self.solve_user_issue, user_issue, user_info)
+                pending[future] = [index]
+                recent[key] = future
+                if len(recent) > BATCH_DEDUPE_WINDOW:
+                    recent.popitem(last=False)
+            
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                response = self._batch_response(future)
+                for position, index in enumerate(pending.pop(future)):
+                    yield index, response if position == 0 else copy.deepcopy(response)
+    
+    async def solve_many_async(self, records: AsyncIterator[Any],
+                               max_concurrency: int = None) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """Async counterpart of solve_many."""
+        max_concurrency = max_concurrency or BATCH_CONCURRENCY
+        pending = {}  # task -> indices of the records waiting on it
+        recent = OrderedDict()  # coalescing key -> task
+        index = -1
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_concurrency:
+                try:
+                    record = await records.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                index += 1
+                problem = self._batch_record_problem(record)
+                if problem:
+                    yield index, {"status": "error", "message": problem}
+                    continue
+                
+                user_issue, user_info = record["issue"], record.get("user_info") or {}
+                key = coalescing_key(user_issue, user_info)
+                task = recent.get(key)
+                if task is not None:
+                    recent.move_to_end(key)
+                    if task in pending:
+                        pending[task].append(index)
+                    else:
+                        yield index, copy.deepcopy(self._batch_response(task))
+                    continue
+                
+                task = asyncio.ensure_future(self.solve_user_issue_async(user_issue, user_info))
+                pending[task] = [index]
+                recent[key] = task
+                if len(recent) > BATCH_DEDUPE_WINDOW:
+                    recent.popitem(last=False)
+            
+            if not pending:
+                return
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                response = self._batch_response(task)
+                for position, waiting_index in enumerate(pending.pop(task)):
+                    yield waiting_index, response if position == 0 else copy.deepcopy(response)
+    
+    @staticmethod
+    def _batch_record_problem(record: Any) -> Optional[str]:
+        if not isinstance(record, dict):
+            return "Invalid record, expected a JSON object"
+        if not isinstance(record.get("issue"), str) or not record["issue"].strip():
+            return "Please describe your issue"
+        if not isinstance(record.get("user_info") or {}, dict):
+            return "user_info must be an object"
+        return None
+    
+    @staticmethod
+    def _batch_response(future) -> Dict[str, Any]:
+        try:
+            return future.result()
+        except Exception as e:
+            return {"status": "error", "message": f"An error occurred: {str(e)}"}
+    
+    async def _solve_user_issue_async(self, user_issue: str, user_info: Dict[str, Any]) -> Dict[str, Any]:
+        return self._assemble_response([event async for event in self.stream_user_issue_async(user_issue, user_info)])
+    
+    @staticmethod
+    def _assemble_response(events: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Build the solve_user_issue response from a stream of events."""
+        response = {"status": "success"}
+        explanation_chunks = []
+        for event, data in events:
+            if event == "explanation":
+                explanation_chunks.append(data["text"])
+            else:
+                response.update(data)
+        response["explanation"] = "".join(explanation_chunks)
+        return response
+    
+    def add_stage(self, stage: Stage) -> None:
+        """Plug an extra stage into the pipeline; its result dict is merged into the response."""
+        # Fail fast on duplicate names, unknown dependencies or cycles
+        Pipeline(self._stages("", {}, None) + [stage])
+        self.extra_stages.append(stage)
+    
+    def stream_user_issue(self, user_issue: str, user_info: Dict[str, Any] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Run the agent pipeline, yielding (event, data) as each stage's output is ready.
+        
+        Every stage yields one event named after it ("policy", "eligibility",
+        "helpline", "complete", plus any added stages), except "explanation",
+        whose text is yielded in chunks. "policy" always comes first and
+        independent stages finish in any order. Merging the data of every
+        event except "explanation", and joining the explanation chunks, gives
+        the solve_user_issue response.
+        
+        The time saved comes from the stage events: the explanation is
+        composed from templates without a model call, so it is complete a
+        moment after eligibility and its chunks only let the page render it
+        line by line.
+        """
+        if user_info is None:
+            user_info = {}
+        for name, data in self._run_stages(user_issue, user_info):
+            yield from self._stage_events(name, data)
+    
+    def _run_stages(self, user_issue: str, user_info: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Run the pipeline, yielding (stage name, result) as each stage finishes."""
+        # One latency budget covers every model call of this request
+        deadline = request_deadline(self.llm_deadline)
+        pipeline = Pipeline(self._stages(user_issue, user_info, deadline))
+        # Stages only overlap usefully while they wait on the model
+        executor = get_pipeline_executor() if self.policy_agent.uses_model() else None
+        for name, data, seconds in pipeline.run(executor):
+            STAGE_STATS.record(name, seconds)
+            yield name, data
+    
+    async def stream_user_issue_async(self, user_issue: str,
+                                      user_info: Dict[str, Any] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Async counterpart of stream_user_issue; model calls are awaited instead of blocking a thread."""
         if user_info is None:
             user_info = {}
         
-        # Step 1: Policy Agent analyzes the issue
-        policy_analysis = self.policy_agent.analyze_user_issue(user_issue)
+        deadline = request_deadline(self.llm_deadline)
+        pipeline = Pipeline(self._stages(user_issue, user_info, deadline))
+        async for name, data, seconds in pipeline.run_async():
+            STAGE_STATS.record(name, seconds)
+            for event in self._stage_events(name, data):
+                yield event
+    
+    def _stages(self, user_issue: str, user_info: Dict[str, Any], deadline: Optional[float]) -> List[Stage]:
+        """Declare the pipeline: policy -> eligibility -> explanation is the critical path."""
+        def explanation(results: Dict[str, Any]) -> Dict[str, Any]:
+            return {"explanation": self.explanation_agent.explain_in_plain_language({
+                "issue_analysis": results["policy"]["issue_analysis"],
+                "eligibility_results": results["eligibility"]["eligibility_results"],
+                "user_info": user_info
+            })}
         
-        # Step 2: Eligibility Agent checks eligibility for relevant schemes
+        return [
+            Stage(
+                "policy",
+                lambda results: {"issue_analysis": self.policy_agent.analyze_user_issue(user_issue, deadline)},
+                async_func=lambda results: self._policy_stage_async(user_issue, deadline)
+            ),
+            Stage(
+                "eligibility",
+                lambda results: self._check_schemes(results["policy"]["issue_analysis"], user_info, deadline),
+                depends_on=("policy",),
+                async_func=lambda results: self._check_schemes_async(results["policy"]["issue_analysis"], user_info, deadline)
+            ),
+            Stage("helpline", lambda results: self._helpline_stage(results["policy"]["issue_analysis"]), depends_on=("policy",)),
+            Stage("explanation", explanation, depends_on=("policy", "eligibility")),
+            Stage("complete", lambda results: self._complete_stage(results["eligibility"]), depends_on=("eligibility",)),
+            *self.extra_stages
+        ]
+    
+    async def _policy_stage_async(self, user_issue: str, deadline: Optional[float]) -> Dict[str, Any]:
+        return {"issue_analysis": await self.policy_agent.analyze_user_issue_async(user_issue, deadline)}
+    
+    @staticmethod
+    def _stage_events(name: str, data: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        # The explanation is already complete here; it is split per line, not produced incrementally
+        if name == "explanation":
+            for chunk in data["explanation"].splitlines(keepends=True):
+                yield "explanation", {"text": chunk}
+        else:
+            yield name, data
+    
+    def _check_schemes(self, policy_analysis: Dict[str, Any], user_info: Dict[str, Any],
+                       deadline: Optional[float]) -> Dict[str, Any]:
+        """Eligibility stage: check every relevant scheme and attach details and documents."""
+        relevant_schemes = policy_analysis.get("relevant_schemes", [])
+        uses_model = self.eligibility_agent.uses_model()
+        if self.eligibility_mode == "batched" and uses_model:
+            eligibilities = self.eligibility_agent.check_eligibility_many(relevant_schemes, user_info, deadline)
+            scheme_results = [
+                self._complete_scheme(scheme, eligibility, user_info)
+                for scheme, eligibility in zip(relevant_schemes, eligibilities)
+            ]
+        else:
+            # Rule-based checks are pure CPU; only model calls benefit from running concurrently
+            concurrency = self.max_concurrency if uses_model else 1
+            scheme_results = run_bounded(
+                lambda scheme: self._evaluate_scheme(scheme, user_info, deadline), relevant_schemes, concurrency
+            )
+        return self._eligibility_payload(relevant_schemes, scheme_results)
+    
+    async def _check_schemes_async(self, policy_analysis: Dict[str, Any], user_info: Dict[str, Any],
+                                   deadline: Optional[float]) -> Dict[str, Any]:
+        relevant_schemes = policy_analysis.get("relevant_schemes", [])
+        if self.eligibility_mode == "batched" and self.eligibility_agent.uses_model():
+            eligibilities = await self.eligibility_agent.check_eligibility_many_async(relevant_schemes, user_info, deadline)
+        else:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            
+            async def _check(scheme: str) -> Dict[str, Any]:
+                async with semaphore:
+                    return await self.eligibility_agent.check_eligibility_async(scheme, user_info, deadline)
+            
+            eligibilities = await asyncio.gather(*(_check(scheme) for scheme in relevant_schemes))
+        scheme_results = [
+            self._complete_scheme(scheme, eligibility, user_info)
+            for scheme, eligibility in zip(relevant_schemes, eligibilities)
+        ]
+        return self._eligibility_payload(relevant_schemes, scheme_results)
+    
+    def _eligibility_payload(self, relevant_schemes: List[str], scheme_results: List[Tuple]) -> Dict[str, Any]:
+        """Collect per-scheme results into the "eligibility" event data."""
         eligibility_results = []
         scheme_details = []
         document_requirements = []
-        
-        for scheme in policy_analysis.get("relevant_schemes", []):
-            eligibility = self.eligibility_agent.check_eligibility(scheme, user_info)
+        for scheme, (eligibility, scheme_detail, doc_result) in zip(relevant_schemes, scheme_results):
             eligibility_results.append({
                 "scheme": scheme,
                 "eligibility": eligibility
             })
-        
-            # Get detailed scheme information
-            scheme_detail = self._get_scheme_details(scheme)
             if scheme_detail:
                 scheme_details.append(scheme_detail)
-                
-                # Get document requirements for eligible schemes
-                if eligibility.get("eligible", False):
-                    doc_result = self.document_agent.collect_documents(scheme, user_info)
-                    if doc_result.get("status") == "success":
-                        document_requirements.append({
-                            "scheme": scheme,
-                            "documents": doc_result.get("required_documents", []),
-                            "message": doc_result.get("collection_message", "")
-                        })
-        
-        # Step 3: Get helpline information
+            if doc_result and doc_result.get("status") == "success":
+                document_requirements.append({
+                    "scheme": scheme,
+                    "documents": doc_result.get("required_documents", []),
+                    "message": doc_result.get("collection_message", "")
+                })
+        return {
+            "eligibility_results": eligibility_results,
+            "scheme_details": scheme_details,
+            "document_requirements": document_requirements
+        }
+    
+    def _helpline_stage(self, policy_analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Helpline stage: only needs the policy analysis."""
         helpline_info = self.helpline_agent.get_helpline_info(
             scheme_name=policy_analysis.get("relevant_schemes", [None])[0] if policy_analysis.get("relevant_schemes") else None,
             issue_type=policy_analysis.get("issue_type")
         )
-        
-        # Step 4: Explanation Agent creates final explanation
-        explanation_data = {
-            "issue_analysis": policy_analysis,
-            "eligibility_results": eligibility_results,
-            "user_info": user_info
-        }
-        
-        final_explanation = self.explanation_agent.explain_in_plain_language(explanation_data)
-        
-        # Step 5: Generate comprehensive response
-        response = {
-            "status": "success",
-            "issue_analysis": policy_analysis,
-            "eligibility_results": eligibility_results,
-            "scheme_details": scheme_details,
-            "document_requirements": document_requirements,
-            "helpline_info": helpline_info,
-            "explanation": final_explanation,
-            "recommendations": self._generate_recommendations(eligibility_results),
-            "next_actions": self._generate_next_actions(eligibility_results, document_requirements)
+        return {"helpline_info": helpline_info}
+    
+    def _complete_stage(self, eligibility: Dict[str, Any]) -> Dict[str, Any]:
+        """Recommendations and next actions, from the eligibility results."""
+        return {
+            "recommendations": self._generate_recommendations(eligibility["eligibility_results"]),
+            "next_actions": self._generate_next_actions(eligibility["eligibility_results"], eligibility["document_requirements"])
         }
-        
-        return response
+    
+    def _evaluate_scheme(self, scheme: str, user_info: Dict[str, Any],
+                         deadline: Optional[float] = None) -> Tuple[Dict, Optional[Dict], Optional[Dict]]:
+        """Check one scheme's eligibility, then its documents if the citizen is eligible."""
+        eligibility = self.eligibility_agent.check_eligibility(scheme, user_info, deadline)
+        return self._complete_scheme(scheme, eligibility, user_info)
+    
+    def _complete_scheme(self, scheme: str, eligibility: Dict[str, Any], user_info: Dict[str, Any]) -> Tuple[Dict, Optional[Dict], Optional[Dict]]:
+        """Attach scheme details and, for eligible schemes, the document requirements."""
+        scheme_detail = self._get_scheme_details(scheme)
+        doc_result = None
+        if scheme_detail and eligibility.get("eligible", False):
+            doc_result = self.document_agent.collect_documents(scheme, user_info)
+        return eligibility, scheme_detail, doc_result
     
     def _get_scheme_details(self, scheme_name: str) -> Dict[str, Any]:
         """Get detailed information about a specific scheme."""
-        for category, schemes in self.policy_agent.policies.items():
-            for scheme in schemes:
-                if scheme["name"] == scheme_name:
-                    return {
-                        "name": scheme["name"],
-                        "description": scheme["description"],
-                        "benefits": scheme.get("benefits", ""),
-                        "application_process": scheme.get("application_process", ""),
-                        "helpline": scheme.get("helpline", ""),
-                        "website": scheme.get("website", ""),
-                        "category": category.replace("_schemes", "").title()
-                    }
-        return None
+        registry = get_scheme_registry()
+        scheme = registry.get(scheme_name)
+        if scheme is None:
+            return None
+        return {
+            "name": scheme["name"],
+            "description": scheme["description"],
+            "benefits": scheme.get("benefits", ""),
+            "application_process": scheme.get("application_process", ""),
+            "helpline": scheme.get("helpline", ""),
+            "website": scheme.get("website", ""),
+            "category": registry.category_of(scheme_name).replace("_schemes", "").title()
+        }
     
     def _generate_next_actions(self, eligibility_results: List[Dict], document_requirements: List[Dict]) -> List[str]:
         """Generate next action steps for the user."""
@@ -0,0 +1,157 @@
+"""
+Stage pipeline for Citizen Bot Pakistan
+Runs the orchestrator's steps as a dependency graph: a stage starts as soon as
+the stages it depends on have finished, so independent stages overlap.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, wait, FIRST_COMPLETED
+from typing import Dict, List, Any, AsyncIterator, Awaitable, Callable, Iterator, Optional, Sequence, Tuple
+
+
+class Stage:
+    """One step of the pipeline.
+
+    ``func`` receives the results of the stages completed so far, keyed by
+    stage name, and returns this stage's result. ``async_func``, if given, is
+    awaited instead when the pipeline runs on an event loop; otherwise
+    ``func`` is called inline there.
+    """
+
+    __slots__ = ("name", "func", "depends_on", "async_func")
+
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Any], depends_on: Sequence[str] = (),
+                 async_func: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.async_func = async_func
+
+
+class Pipeline:
+    """A validated dependency graph of stages."""
+
+    def __init__(self, stages: Sequence[Stage]):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage: {stage.name}")
+            self.stages[stage.name] = stage
+        for stage in stages:
+            unknown = [name for name in stage.depends_on if name not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {', '.join(unknown)}")
+        self.order = self._topological_order()
+
+    def run(self, executor: Optional[Executor] = None) -> Iterator[Tuple[str, Any, float]]:
+        """Run every stage, yielding (name, result, seconds) as each one finishes.
+
+        Without an executor the stages run inline, one at a time, in
+        dependency order. With one, every stage whose dependencies are done is
+        submitted at once.
+        """
+        results = {}
+        if executor is None:
+            for name in self.order:
+                result, seconds = _timed(self.stages[name].func, dict(results))
+                results[name] = result
+                yield name, result, seconds
+            return
+
+        pending = {}
+        while len(results) < len(self.stages):
+            for name in self._ready(results, pending.values()):
+                pending[executor.submit(_timed, self.stages[name].func, dict(results))] = name
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                result, seconds = future.result()
+                results[name] = result
+                yield name, result, seconds
+
+    async def run_async(self) -> AsyncIterator[Tuple[str, Any, float]]:
+        """Async counterpart of run; independent stages run as concurrent tasks."""
+        results = {}
+        pending = {}
+        while len(results) < len(self.stages):
+            for name in self._ready(results, pending.values()):
+                pending[asyncio.ensure_future(_timed_async(self.stages[name], dict(results)))] = name
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Report in dependency order when several finish together
+            for future in sorted(done, key=lambda finished: self.order.index(pending[finished])):
+                name = pending.pop(future)
+                result, seconds = future.result()
+                results[name] = result
+                yield name, result, seconds
+
+    def _ready(self, results: Dict[str, Any], running) -> List[str]:
+        running = set(running)
+        return [
+            name for name in self.order
+            if name not in results and name not in running
+            and all(dependency in results for dependency in self.stages[name].depends_on)
+        ]
+
+    def _topological_order(self) -> List[str]:
+        order = []
+        visiting = set()
+
+        def visit(name: str) -> None:
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage dependency cycle through {name}")
+            visiting.add(name)
+            for dependency in self.stages[name].depends_on:
+                visit(dependency)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+
+def _timed(func: Callable[[Dict[str, Any]], Any], results: Dict[str, Any]) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = func(results)
+    return result, time.perf_counter() - start
+
+
+async def _timed_async(stage: Stage, results: Dict[str, Any]) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    if stage.async_func is not None:
+        result = await stage.async_func(results)
+    else:
+        result = stage.func(results)
+    return result, time.perf_counter() - start
+
+
+class StageStats:
+    """Thread-safe per-stage timing counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, stage_name: str, seconds: float) -> None:
+        milliseconds = seconds * 1000
+        with self._lock:
+            entry = self._stats.setdefault(stage_name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += milliseconds
+            entry["max_ms"] = max(entry["max_ms"], milliseconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Return a copy of the counters with the average time per stage."""
+        with self._lock:
+            return {
+                name: {
+                    "count": entry["count"],
+                    "avg_ms": round(entry["total_ms"] / entry["count"], 2),
+                    "max_ms": round(entry["max_ms"], 2)
+                }
+                for name, entry in self._stats.items()
+            }
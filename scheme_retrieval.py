@@ -0,0 +1,122 @@
+"""
+Scheme retrieval for Citizen Bot Pakistan
+Embeds each scheme's name, description and benefits as a hashed TF-IDF vector,
+stacked into one dense NumPy matrix when the catalogue loads. A request is
+matched against every scheme at once by cosine similarity and only the top-k
+schemes are kept, so per-request work stays bounded as the catalogue grows.
+"""
+
+import math
+import re
+import zlib
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+# NumPy holds the index; without it retrieval is unavailable
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+DEFAULT_NUM_FEATURES = 2 ** 12
+# Added to the cosine of schemes in the issue's category, so they rank first
+CATEGORY_BONUS = 0.5
+# Schemes outside the issue's category need at least this cosine to be retrieved
+MIN_SIMILARITY = 0.15
+# Scheme fields whose text is indexed
+INDEXED_FIELDS = ("name", "description", "benefits")
+
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+")
+STOP_WORDS = frozenset((
+    "a", "an", "and", "are", "at", "for", "from", "i", "in", "is", "it", "me", "my", "of", "on", "or",
+    "our", "the", "their", "this", "to", "up", "we", "with"
+))
+
+
+def terms(text: str) -> List[str]:
+    """Lower-case word terms of a text, without stop words and with a plural "s" dropped."""
+    found = []
+    for token in TOKEN_PATTERN.findall(text.casefold()):
+        if token in STOP_WORDS or len(token) < 2:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        found.append(token)
+    return found
+
+
+def hashed_counts(text: str, num_features: int) -> Dict[int, int]:
+    """Term counts of a text, keyed by CRC32 feature index."""
+    counts = {}
+    for term in terms(text):
+        index = zlib.crc32(term.encode("utf-8")) % num_features
+        counts[index] = counts.get(index, 0) + 1
+    return counts
+
+
+class SchemeIndex:
+    """Dense (schemes x features) TF-IDF matrix with cosine top-k lookup."""
+
+    def __init__(self, schemes: Sequence[Tuple[str, str, str]], num_features: int = DEFAULT_NUM_FEATURES):
+        """Index (name, category, text) triples."""
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy is required for scheme retrieval")
+        self.num_features = num_features
+        self.names = tuple(name for name, _, _ in schemes)
+        self.categories = np.asarray([category for _, category, _ in schemes], dtype=object)
+
+        counts = [hashed_counts(text, num_features) for _, _, text in schemes]
+        document_frequency = np.zeros(num_features, dtype=np.float32)
+        for row in counts:
+            document_frequency[list(row)] += 1
+        # Smoothed IDF; features no scheme uses keep the largest weight but never score
+        self.idf = (np.log((1 + len(schemes)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        self.matrix = np.zeros((len(schemes), num_features), dtype=np.float32)
+        for row, row_counts in enumerate(counts):
+            for index, count in row_counts.items():
+                self.matrix[row, index] = (1 + math.log(count)) * self.idf[index]
+        norms = np.linalg.norm(self.matrix, axis=1, keepdims=True)
+        np.divide(self.matrix, norms, out=self.matrix, where=norms > 0)
+
+    @classmethod
+    def from_policies(cls, policies: Dict[str, List[Dict[str, Any]]],
+                      num_features: int = DEFAULT_NUM_FEATURES) -> "SchemeIndex":
+        """Index every scheme of a policy catalogue."""
+        return cls([
+            (scheme["name"], category, " ".join(str(scheme.get(field, "")) for field in INDEXED_FIELDS))
+            for category, schemes in policies.items()
+            for scheme in schemes
+        ], num_features)
+
+    def similarities(self, text: str) -> Any:
+        """Cosine similarity of a text to every scheme, in index order."""
+        counts = hashed_counts(text, self.num_features)
+        if not counts or not self.names:
+            return np.zeros(len(self.names), dtype=np.float32)
+        indices = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        weights = np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts))) + 1
+        weights *= self.idf[indices]
+        weights /= np.linalg.norm(weights)
+        # Only the query's own columns can contribute, so gather those instead of a full product
+        return self.matrix[:, indices] @ weights
+
+    def top_k(self, text: str, k: int, category: Optional[str] = None,
+              min_similarity: float = MIN_SIMILARITY) -> List[Tuple[str, float]]:
+        """Return up to k (scheme name, score) pairs, best first.
+
+        Schemes in ``category`` get CATEGORY_BONUS on top of their cosine and
+        are always candidates; other schemes only with a cosine of at least
+        min_similarity, so unrelated schemes never pad the result.
+        """
+        if k <= 0 or not self.names:
+            return []
+        similarities = self.similarities(text)
+        in_category = self.categories == category
+        scores = similarities + CATEGORY_BONUS * in_category
+        scores[~in_category & (similarities < min_similarity)] = 0
+        k = min(k, len(self.names))
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        ranked = sorted(candidates, key=lambda row: (-scores[row], row))
+        return [(self.names[row], round(float(scores[row]), 4)) for row in ranked if scores[row] > 0]
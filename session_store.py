@@ -0,0 +1,60 @@
+"""
+Session state for Citizen Bot Pakistan
+Keeps each browser session's latest issue analysis and eligibility verdicts,
+keyed by a session id cookie, so follow-up endpoints (such as
+/api/assist-application) reuse them instead of asking the model again.
+"""
+
+import secrets
+from typing import Dict, Any, Optional
+
+from cache_store import PersistentLRUCache
+
+SESSION_COOKIE = "session_id"
+
+
+class SessionStore:
+    """TTL-expiring per-session analysis, in an LRU optionally backed by SQLite."""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 1800, sqlite_path: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.records = PersistentLRUCache(
+            max_entries=max_entries, ttl_seconds=ttl_seconds, sqlite_path=sqlite_path, table="sessions"
+        )
+
+    @staticmethod
+    def new_session_id() -> str:
+        """Return a fresh, unguessable session id."""
+        return secrets.token_urlsafe(24)
+
+    @staticmethod
+    def is_valid_id(session_id: Optional[str]) -> bool:
+        """True if session_id looks like one new_session_id made."""
+        return bool(session_id) and len(session_id) == 32 and session_id.replace("-", "").replace("_", "").isalnum()
+
+    def get(self, session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return the session's latest analysis, or None if it has none or expired."""
+        if not self.is_valid_id(session_id):
+            return None
+        # Another worker may have stored a newer analysis for this session
+        return self.records.get(session_id, fresh=True)
+
+    def save_analysis(self, session_id: str, user_issue: str, user_info: Dict[str, Any],
+                      response: Dict[str, Any]) -> None:
+        """Remember the parts of a server-computed /submit-issue response that follow-up calls can reuse."""
+        if response.get("status") != "success" or "issue_analysis" not in response:
+            return
+        self.records.set(session_id, {
+            "issue": user_issue,
+            "user_info": user_info,
+            "issue_analysis": response["issue_analysis"],
+            "eligibility": {
+                result["scheme"]: result["eligibility"]
+                for result in response.get("eligibility_results", [])
+            },
+            "helpline_info": response.get("helpline_info")
+        })
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the underlying cache counters."""
+        return self.records.stats()
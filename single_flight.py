@@ -0,0 +1,128 @@
+"""
+Single-flight request coalescing for Citizen Bot Pakistan
+Concurrent calls with the same key wait on one in-flight computation and
+share its result instead of repeating the work.
+"""
+
+import copy
+import asyncio
+import threading
+from typing import Dict, Any, Awaitable, Callable, Hashable, Tuple
+
+
+class _InFlightCall:
+    """One running computation and the callers waiting on it."""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into a single call."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._leaders = 0
+        self._coalesced = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run func, or wait for the identical call already running; returns (result, shared).
+
+        Callers that joined an in-flight call each get their own deep copy of
+        the result, so none of them can see another's mutations. If func
+        raises, every caller waiting on it gets the same exception.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _InFlightCall()
+                self._leaders += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self._coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result), True
+
+        try:
+            result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        else:
+            with self._lock:
+                # No one can join once the call is removed, so the waiter count is final here
+                del self._calls[key]
+                waiters = call.waiters
+            if waiters:
+                call.result = copy.deepcopy(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many calls ran and how many were served by joining one."""
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self._leaders,
+                "coalesced": self._coalesced
+            }
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines; all callers must share one event loop."""
+
+    def __init__(self):
+        self._calls = {}  # key -> [future, waiters]
+        self._leaders = 0
+        self._coalesced = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Await func(), or the identical call already running; returns (result, shared)."""
+        call = self._calls.get(key)
+        if call is not None:
+            call[1] += 1
+            self._coalesced += 1
+            # Shielded so a cancelled waiter does not cancel the shared call
+            result = await asyncio.shield(call[0])
+            return copy.deepcopy(result), True
+
+        future = asyncio.get_running_loop().create_future()
+        call = self._calls[key] = [future, 0]
+        self._leaders += 1
+        try:
+            result = await func()
+        except BaseException as e:
+            del self._calls[key]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Mark retrieved, so a call no one waited on does not log a warning
+                future.exception()
+            raise
+        del self._calls[key]
+        future.set_result(copy.deepcopy(result) if call[1] else result)
+        return result, False
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many calls ran and how many were served by joining one."""
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self._leaders,
+            "coalesced": self._coalesced
+        }